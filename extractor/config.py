@@ -1,60 +1,61 @@
 """
 Configuration management for the Boston Weather ETL Pipeline.
 """
+import functools
 import os
-from typing import Optional, Dict, Any
-try:
-    from pydantic_settings import BaseSettings
-    from pydantic import validator
-except ImportError:
-    from pydantic import BaseSettings, validator
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Dict, Any
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 
-class WeatherConfig(BaseSettings):
+def _env(name: str, default: Any, cast: Callable[[str], Any] = str) -> Callable[[], Any]:
+    """Build a dataclass default factory that reads and casts an environment variable."""
+    def factory():
+        value = os.getenv(name)
+        return default if value is None else cast(value)
+    return factory
+
+
+@dataclass(frozen=True)
+class WeatherConfig:
     """Configuration settings for the weather ETL pipeline."""
     
     # Location Configuration
-    boston_lat: float = 42.3601
-    boston_lon: float = -71.0589
+    boston_lat: float = field(default_factory=_env("BOSTON_LAT", 42.3601, float))
+    boston_lon: float = field(default_factory=_env("BOSTON_LON", -71.0589, float))
     
     # Database Configuration
-    duckdb_path: str = "/data/weather.db"
+    duckdb_path: str = field(default_factory=_env("DUCKDB_PATH", "/data/weather.db"))
+    
+    # NWS metadata cache file (persists points metadata across restarts).
+    # Unset keeps the cache in memory, so tests and ad-hoc runs don't share one.
+    nws_cache_path: Optional[str] = field(
+        default_factory=_env("NWS_CACHE_PATH", None, lambda v: v or None)
+    )
     
     # Logging Configuration
-    log_level: str = "INFO"
+    log_level: str = field(default_factory=_env("LOG_LEVEL", "INFO"))
     
     # Scheduling Configuration
-    current_weather_interval: int = 10  # minutes
-    hourly_weather_interval: int = 10   # minutes
-    daily_weather_interval: int = 1440  # minutes (24 hours)
+    current_weather_interval: int = field(default_factory=_env("CURRENT_WEATHER_INTERVAL", 10, int))  # minutes
+    hourly_weather_interval: int = field(default_factory=_env("HOURLY_WEATHER_INTERVAL", 10, int))    # minutes
+    daily_weather_interval: int = field(default_factory=_env("DAILY_WEATHER_INTERVAL", 1440, int))    # minutes (24 hours)
     
-    @validator('boston_lat')
-    def validate_lat(cls, v):
-        if not -90 <= v <= 90:
-            raise ValueError("Latitude must be between -90 and 90")
-        return v
+    # Whether the configured location is inside NWS coverage. Always derived from
+    # the coordinates (the coverage areas are constants), never read from input.
+    in_nws_coverage: bool = field(init=False, default=False)
     
-    @validator('boston_lon')
-    def validate_lon(cls, v):
-        if not -180 <= v <= 180:
+    def __post_init__(self):
+        if not -90 <= self.boston_lat <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        if not -180 <= self.boston_lon <= 180:
             raise ValueError("Longitude must be between -180 and 180")
-        return v
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-        extra = "ignore"  # Ignore extra environment variables
-
-
-# Global configuration instance
-config = WeatherConfig()
-
-
-
+        object.__setattr__(
+            self, 'in_nws_coverage', NWSConfig.validate_coordinates(self.boston_lat, self.boston_lon)
+        )
 
 
 class DatabaseConfig:
@@ -107,6 +108,28 @@ class DatabaseConfig:
         )
     """
     
+    # Column order for each table, used by the bulk insert paths
+    CURRENT_WEATHER_COLUMNS = (
+        'timestamp', 'temp', 'feels_like', 'humidity', 'pressure',
+        'wind_speed', 'wind_deg', 'description', 'icon'
+    )
+    HOURLY_WEATHER_COLUMNS = CURRENT_WEATHER_COLUMNS + ('pop',)
+    DAILY_WEATHER_COLUMNS = (
+        'date', 'temp_min', 'temp_max', 'temp_day', 'temp_night', 'humidity',
+        'pressure', 'wind_speed', 'wind_deg', 'description', 'icon', 'pop'
+    )
+    
+    # DuckDB settings applied to every connection the pipeline opens. The
+    # extractor is a single writer in a container: pin threads and memory so a
+    # large query can't exhaust the container, spill to local temp storage, and
+    # skip preserving insertion order (inserts sort explicitly where needed).
+    SETTINGS = {
+        'threads': 4,
+        'memory_limit': '2GB',
+        'temp_directory': '/tmp/duckdb_spill',
+        'preserve_insertion_order': False,
+    }
+    
     # Indexes for better query performance
     INDEXES = [
         "CREATE INDEX IF NOT EXISTS idx_current_weather_timestamp ON current_weather(timestamp)",
@@ -140,7 +163,25 @@ class NWSConfig:
     RETRY_ATTEMPTS = 3
     RETRY_DELAY = 1  # seconds
     
+    # NWS coverage bounding boxes as (lat_min, lat_max, lon_min, lon_max)
+    COVERAGE_AREAS = (
+        (24.5, 49.4, -125.0, -66.9),   # Continental US
+        (51.2, 71.4, -179.1, -129.9),  # Alaska
+        (18.9, 28.4, -178.3, -154.8),  # Hawaii
+        (17.8, 18.6, -67.3, -65.2),    # Puerto Rico and other territories
+    )
+    
+    # Envelope of all coverage areas as (lat_min, lat_max, lon_min, lon_max),
+    # used to reject far-away coordinates before the per-area checks
+    COVERAGE_ENVELOPE = (
+        min(area[0] for area in COVERAGE_AREAS),
+        max(area[1] for area in COVERAGE_AREAS),
+        min(area[2] for area in COVERAGE_AREAS),
+        max(area[3] for area in COVERAGE_AREAS),
+    )
+    
     @classmethod
+    @functools.lru_cache(maxsize=16)
     def get_points_url(cls, lat: float, lon: float) -> str:
         """Generate the Points API URL for getting forecast URLs."""
         return f"{cls.BASE_URL}/points/{lat},{lon}"
@@ -154,24 +195,14 @@ class NWSConfig:
         }
     
     @classmethod
+    @functools.lru_cache(maxsize=1024)
     def validate_coordinates(cls, lat: float, lon: float) -> bool:
         """Validate that coordinates are within NWS coverage area (US territories)."""
-        # Basic validation for continental US, Alaska, Hawaii, and territories
-        # Continental US: roughly 24.5°N to 49.4°N, -125°W to -66.9°W
-        # Alaska: roughly 51.2°N to 71.4°N, -179.1°W to -129.9°W
-        # Hawaii: roughly 18.9°N to 28.4°N, -178.3°W to -154.8°W
-        
-        # Continental US
-        if 24.5 <= lat <= 49.4 and -125.0 <= lon <= -66.9:
-            return True
-        # Alaska
-        if 51.2 <= lat <= 71.4 and -179.1 <= lon <= -129.9:
-            return True
-        # Hawaii
-        if 18.9 <= lat <= 28.4 and -178.3 <= lon <= -154.8:
-            return True
-        # Puerto Rico and other territories
-        if 17.8 <= lat <= 18.6 and -67.3 <= lon <= -65.2:
-            return True
-        
-        return False 
\ No newline at end of file
+        return any(
+            lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+            for lat_min, lat_max, lon_min, lon_max in cls.COVERAGE_AREAS
+        )
+
+
+# Global configuration instance
+config = WeatherConfig()
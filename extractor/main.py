@@ -6,11 +6,17 @@ Fetches weather data from National Weather Service (NWS) API for Boston
 and stores it in DuckDB for further processing.
 """
 
+import atexit
+import functools
+import logging
 import time
+import orjson
 import schedule
 import requests
 import structlog
-from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 import os
 import sys
@@ -18,10 +24,11 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import config, NWSConfig, DatabaseConfig, NWSAPIError, NWSGeographicError, NWSServiceUnavailableError
+from config import config, NWSConfig, NWSAPIError, NWSGeographicError, NWSServiceUnavailableError
 from nws_cache import NWSCache
 from utils import (
     DatabaseManager, 
+    connect_database,
     format_weather_description,
     calculate_api_usage_stats,
     transform_nws_current_weather,
@@ -30,6 +37,11 @@ from utils import (
     validate_nws_response
 )
 
+def _orjson_dumps(obj: Any, **kwargs: Any) -> str:
+    """Serialize log events with orjson; the stdlib logger expects str, not bytes."""
+    return orjson.dumps(obj, **kwargs).decode()
+
+
 # Configure structured logging
 structlog.configure(
     processors=[
@@ -41,7 +53,7 @@ structlog.configure(
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.processors.JSONRenderer(serializer=_orjson_dumps)
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
@@ -60,18 +72,38 @@ class WeatherExtractor:
         self.lon = config.boston_lon
         self.db_path = config.duckdb_path
         
-        # Initialize NWS cache with 1 hour TTL
-        self.nws_cache = NWSCache(cache_ttl=3600)
+        # Persistent HTTP session so requests to api.weather.gov reuse keep-alive connections
+        self.session = requests.Session()
+        retry_policy = Retry(
+            total=NWSConfig.RETRY_ATTEMPTS - 1,
+            backoff_factor=NWSConfig.RETRY_DELAY,
+            status_forcelist=[503],
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry_policy))
+        self.session.headers.update(NWSConfig.get_headers())
         
-        # Validate coordinates are within NWS coverage
-        if not NWSConfig.validate_coordinates(self.lat, self.lon):
+        # Initialize NWS cache with 1 hour TTL, persisted (when NWS_CACHE_PATH is set)
+        # so restarts skip the points lookup
+        self.nws_cache = NWSCache(cache_ttl=3600, cache_path=config.nws_cache_path)
+        
+        # Coverage is resolved once when the configuration is loaded
+        if not config.in_nws_coverage:
             raise NWSGeographicError(f"Coordinates ({self.lat}, {self.lon}) are outside NWS coverage area")
         
+        # Indexes are deferred on a fresh database until the first load is stored
+        self._indexes_pending = not os.path.exists(self.db_path)
+        
+        # Long-lived DuckDB connection shared by every extraction
+        self.connection = None
+        
         # Initialize database
         self._initialize_database()
+        atexit.register(self.close)
         
-        # Database manager reference
-        self.db_manager = DatabaseManager
+        # Database manager factory bound to the shared connection
+        self.db_manager = functools.partial(DatabaseManager, connection=self.connection)
     
     def _initialize_database(self):
         """Initialize the database with required tables."""
@@ -79,61 +111,46 @@ class WeatherExtractor:
             # Create data directory if it doesn't exist
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
             
-            with DatabaseManager(self.db_path) as db:
-                db.initialize_database()
+            self.connection = connect_database(self.db_path)
+            with DatabaseManager(self.db_path, self.connection) as db:
+                db.initialize_database(defer_indexes=self._indexes_pending)
             logger.info("Database initialization completed")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
     
     def _make_nws_request(self, url: str) -> Optional[Dict[str, Any]]:
-        """Make HTTP request to NWS API with proper headers and retry logic."""
-        headers = NWSConfig.get_headers()
+        """
+        Make HTTP request to NWS API with proper headers.
         
-        for attempt in range(NWSConfig.RETRY_ATTEMPTS):
-            try:
-                logger.info(f"Making NWS API request to: {url} (attempt {attempt + 1}/{NWSConfig.RETRY_ATTEMPTS})")
-                
-                response = requests.get(url, headers=headers, timeout=NWSConfig.TIMEOUT)
-                
-                # Handle NWS-specific error responses
-                if response.status_code == 404:
-                    raise NWSGeographicError("Location outside NWS coverage area")
-                elif response.status_code == 503:
-                    # Service unavailable - retry with exponential backoff
-                    if attempt < NWSConfig.RETRY_ATTEMPTS - 1:
-                        wait_time = NWSConfig.RETRY_DELAY * (2 ** attempt)
-                        logger.warning(f"NWS API temporarily unavailable, retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        raise NWSServiceUnavailableError("NWS API temporarily unavailable after all retries")
-                elif response.status_code != 200:
-                    logger.error(f"NWS API request failed with status {response.status_code}: {response.text}")
-                    return None
-                
-                data = response.json()
-                logger.debug("NWS API request successful")
-                return data
-                
-            except NWSGeographicError:
-                raise  # Don't retry geographic errors
-            except NWSServiceUnavailableError:
-                raise  # Don't retry if we've exhausted attempts
-            except requests.exceptions.RequestException as e:
-                if attempt < NWSConfig.RETRY_ATTEMPTS - 1:
-                    wait_time = NWSConfig.RETRY_DELAY * (2 ** attempt)
-                    logger.warning(f"NWS API request failed: {e}, retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"NWS API request failed after all retries: {e}")
-                    return None
-            except Exception as e:
-                logger.error(f"Unexpected error during NWS API request: {e}")
-                return None
+        Retries with exponential backoff (connection errors and 503 responses)
+        are handled by the urllib3 Retry policy mounted on the session.
+        """
+        try:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Making NWS API request to: {url}")
+            response = self.session.get(url, timeout=NWSConfig.TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"NWS API request failed after all retries: {e}")
+            return None
         
-        return None
+        # Handle NWS-specific error responses
+        if response.status_code == 404:
+            raise NWSGeographicError("Location outside NWS coverage area")
+        elif response.status_code == 503:
+            raise NWSServiceUnavailableError("NWS API temporarily unavailable after all retries")
+        elif response.status_code != 200:
+            logger.error(f"NWS API request failed with status {response.status_code}: {response.text}")
+            return None
+        
+        try:
+            data = orjson.loads(response.content)
+        except ValueError as e:
+            logger.error(f"Invalid JSON in NWS API response: {e}")
+            return None
+        
+        logger.debug("NWS API request successful")
+        return data
     
     def _get_nws_metadata(self) -> Optional[Dict[str, Any]]:
         """Get NWS point metadata including forecast URLs. Uses caching to avoid redundant API calls."""
@@ -141,7 +158,8 @@ class WeatherExtractor:
             # Check cache first
             cached_data = self.nws_cache.get_cached_points(self.lat, self.lon)
             if cached_data is not None:
-                logger.debug(f"Using cached NWS metadata for coordinates ({self.lat}, {self.lon})")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Using cached NWS metadata for coordinates ({self.lat}, {self.lon})")
                 return cached_data
             
             # Fetch from API if not cached
@@ -162,6 +180,34 @@ class WeatherExtractor:
             logger.error(f"Failed to get NWS metadata: {e}")
             return None
     
+    def _fetch(self, url: str, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch an NWS resource and validate it as the given response type.
+        
+        Args:
+            url: NWS API endpoint URL
+            kind: Response type passed to validate_nws_response ('current', 'hourly', 'daily')
+        """
+        try:
+            data = self._make_nws_request(url)
+            
+            if not data or not validate_nws_response(data, kind):
+                logger.error(f"Failed to get valid NWS {kind} data")
+                return None
+            
+            if kind == 'hourly':
+                # The hourly feed carries ~156 periods but only the first 48 are
+                # transformed; drop the rest now instead of holding them until the
+                # whole tick has been fetched and stored
+                del data['properties']['periods'][48:]
+            
+            logger.info(f"Successfully retrieved NWS {kind} data")
+            return data
+            
+        except Exception as e:
+            logger.error(f"Failed to fetch NWS {kind} data: {e}")
+            return None
+    
     def _fetch_current_conditions(self, station_url: str) -> Optional[Dict[str, Any]]:
         """Fetch current weather from nearest station."""
         try:
@@ -184,51 +230,12 @@ class WeatherExtractor:
                 return None
             
             current_url = f"{NWSConfig.BASE_URL}/stations/{station_id}/observations/latest"
-            current_data = self._make_nws_request(current_url)
-            
-            if not current_data or not validate_nws_response(current_data, 'current'):
-                logger.error("Failed to get valid current conditions")
-                return None
-            
-            logger.info("Successfully retrieved current conditions")
-            return current_data
+            return self._fetch(current_url, 'current')
             
         except Exception as e:
             logger.error(f"Failed to fetch current conditions: {e}")
             return None
     
-    def _fetch_hourly_forecast(self, forecast_url: str) -> Optional[Dict[str, Any]]:
-        """Fetch hourly forecast data."""
-        try:
-            hourly_data = self._make_nws_request(forecast_url)
-            
-            if not hourly_data or not validate_nws_response(hourly_data, 'hourly'):
-                logger.error("Failed to get valid hourly forecast")
-                return None
-            
-            logger.info("Successfully retrieved hourly forecast")
-            return hourly_data
-            
-        except Exception as e:
-            logger.error(f"Failed to fetch hourly forecast: {e}")
-            return None
-    
-    def _fetch_daily_forecast(self, forecast_url: str) -> Optional[Dict[str, Any]]:
-        """Fetch daily forecast data."""
-        try:
-            daily_data = self._make_nws_request(forecast_url)
-            
-            if not daily_data or not validate_nws_response(daily_data, 'daily'):
-                logger.error("Failed to get valid daily forecast")
-                return None
-            
-            logger.info("Successfully retrieved daily forecast")
-            return daily_data
-            
-        except Exception as e:
-            logger.error(f"Failed to fetch daily forecast: {e}")
-            return None
-    
     def extract_and_store_weather_data(self):
         """Extract weather data from NWS API and store in database."""
         try:
@@ -247,10 +254,15 @@ class WeatherExtractor:
                 logger.error("Missing required URLs in NWS points response")
                 return
             
-            # Step 2: Fetch all weather data
-            current_data = self._fetch_current_conditions(stations_url)
-            hourly_data = self._fetch_hourly_forecast(forecast_hourly_url)
-            daily_data = self._fetch_daily_forecast(forecast_url)
+            # Step 2: Fetch all weather data concurrently (the requests are independent)
+            with ThreadPoolExecutor(max_workers=3, thread_name_prefix="nws-fetch") as executor:
+                current_future = executor.submit(self._fetch_current_conditions, stations_url)
+                hourly_future = executor.submit(self._fetch, forecast_hourly_url, 'hourly')
+                daily_future = executor.submit(self._fetch, forecast_url, 'daily')
+                
+                current_data = current_future.result()
+                hourly_data = hourly_future.result()
+                daily_data = daily_future.result()
             
             # Step 3: Transform data to match existing schema
             transformed_current = None
@@ -266,23 +278,37 @@ class WeatherExtractor:
             if daily_data:
                 transformed_daily = transform_nws_daily_forecast(daily_data)
             
-            # Step 4: Store data in database
-            with DatabaseManager(self.db_path) as db:
-                # Store current weather
-                if transformed_current:
-                    db.insert_current_weather(transformed_current)
+            # Step 4: Store data in database in a single transaction
+            with DatabaseManager(self.db_path, self.connection) as db:
+                db.begin()
+                try:
+                    # Store current weather
+                    if transformed_current:
+                        db.insert_current_weather(transformed_current)
                     
-                    # Log current weather info
-                    description = format_weather_description(transformed_current)
-                    logger.info(f"Current weather in Boston: {description}")
-                
-                # Store hourly weather
-                if transformed_hourly:
-                    db.insert_hourly_weather(transformed_hourly)
+                    # Store hourly weather
+                    if transformed_hourly:
+                        db.insert_hourly_weather(transformed_hourly)
+                    
+                    # Store daily weather
+                    if transformed_daily:
+                        db.insert_daily_weather(transformed_daily)
+                    
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
                 
-                # Store daily weather
-                if transformed_daily:
-                    db.insert_daily_weather(transformed_daily)
+                # Build the deferred indexes once the initial load is in place
+                if self._indexes_pending:
+                    db.create_indexes()
+                    self._indexes_pending = False
+                    logger.info("Database indexes created after initial load")
+            
+            if transformed_current:
+                # Log current weather info
+                description = format_weather_description(transformed_current)
+                logger.info(f"Current weather in Boston: {description}")
             
             logger.info("NWS weather data extraction and storage completed successfully")
             
@@ -308,7 +334,7 @@ class WeatherExtractor:
     def log_stats(self):
         """Log current statistics."""
         try:
-            stats = calculate_api_usage_stats()
+            stats = calculate_api_usage_stats(self.db_path, self.connection)
             if stats:
                 logger.info("Current pipeline statistics", **stats)
             
@@ -328,6 +354,15 @@ class WeatherExtractor:
         except Exception as e:
             logger.error(f"Failed to cleanup cache: {e}")
     
+    def close(self):
+        """Close the HTTP session and the shared database connection."""
+        # Drop the exit hook so closed extractors can be garbage collected
+        atexit.unregister(self.close)
+        self.session.close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
     def run_scheduler(self):
         """Run the scheduled weather data extraction."""
         logger.info("Starting weather data extraction scheduler")
@@ -341,18 +376,16 @@ class WeatherExtractor:
         # Schedule statistics logging (every hour)
         schedule.every().hour.do(self.log_stats)
         
-        # Schedule cache cleanup (every 2 hours)
-        schedule.every(2).hours.do(self.cleanup_cache)
-        
         # Run initial extraction
         logger.info("Running initial weather data extraction")
         self.extract_and_store_weather_data()
         
-        # Keep the scheduler running
+        # Keep the scheduler running, sleeping until the next job is due
         while True:
             try:
                 schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                idle_seconds = schedule.idle_seconds()
+                time.sleep(max(idle_seconds, 0) if idle_seconds is not None else 60)
             except KeyboardInterrupt:
                 logger.info("Scheduler stopped by user")
                 break
@@ -1,29 +1,112 @@
 """
 Caching mechanism for NWS API metadata to reduce redundant API calls.
 """
+import heapq
+import os
+import threading
 import time
-from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import logging
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 
 class NWSCache:
     """Cache NWS metadata and reduce API calls."""
     
-    def __init__(self, cache_ttl: int = 3600):
+    def __init__(self, cache_ttl: int = 3600, cache_path: Optional[str] = None,
+                 station_ttl: int = 86400, negative_ttl: int = 604800,
+                 max_entries: int = 1024, time_fn: Callable[[], float] = time.time):
         """
         Initialize the cache.
         
         Args:
             cache_ttl: Cache time-to-live in seconds (default: 1 hour)
+            station_ttl: Time-to-live in seconds for resolved observation
+                stations, which change far less often (default: 24 hours)
+            negative_ttl: Time-to-live in seconds for locations known to be
+                outside NWS coverage (default: 7 days)
+            cache_path: Optional JSON file used to persist the cache across
+                restarts. When omitted the cache is kept in memory only.
+            max_entries: Maximum number of points entries; beyond it the least
+                recently used entry is evicted even if it has not expired.
+            time_fn: Clock for expiry times (default: time.time). Wall-clock
+                time rather than monotonic, since persisted expiry times must
+                survive a restart; tests pass a fake clock.
         """
-        self.points_cache: Dict[Tuple[float, float], Dict[str, Any]] = {}
+        # Entries are (expires_at, data) so the payload is never copied or
+        # modified, and each entry can carry its own TTL. Ordered from least
+        # to most recently used.
+        self.points_cache: "OrderedDict[Tuple[float, float], Tuple[float, Dict[str, Any]]]" = OrderedDict()
         self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        # Observation station chosen per location, as (expires_at, station_id).
+        # Kept in memory only; reselecting after a restart costs one request.
+        self.station_cache: Dict[Tuple[float, float], Tuple[float, str]] = {}
+        self.station_ttl = station_ttl
+        # Expiry times for locations the API reported as outside coverage
+        self.negative_cache: Dict[Tuple[float, float], float] = {}
+        self.negative_ttl = negative_ttl
+        self._now = time_fn
+        # Min-heap of (expires_at, key) over points_cache, so expired entries
+        # are found without scanning the cache. Overwritten and read-evicted
+        # entries leave stale heap items, which are skipped when popped.
+        self._expiry_heap: List[Tuple[float, Tuple[float, float]]] = []
+        # Guards all of the above; the client's fetch_all and fetch_many use
+        # the cache from worker threads
+        self._lock = threading.Lock()
+        
+        if self.cache_path:
+            self._load()
     
-    def _is_expired(self, timestamp: float) -> bool:
-        """Check if a cache entry is expired."""
-        return time.time() - timestamp > self.cache_ttl
+    def _load(self) -> None:
+        """Load persisted cache entries from disk."""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                stored = orjson.loads(f.read())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load NWS cache from {self.cache_path}: {e}")
+            return
+        
+        for key, (expires_at, data) in stored.items():
+            lat, lon = (float(part) for part in key.split(','))
+            self.points_cache[(lat, lon)] = (expires_at, data)
+        self._evict_lru()
+        self._rebuild_expiry_heap()
+        
+        logger.debug(f"Loaded {len(self.points_cache)} NWS cache entries from {self.cache_path}")
+    
+    def _save(self) -> None:
+        """Atomically write the cache to disk if persistence is enabled (lock held)."""
+        if not self.cache_path:
+            return
+        
+        stored = {f"{lat},{lon}": entry for (lat, lon), entry in self.points_cache.items()}
+        tmp_path = f"{self.cache_path}.tmp"
+        
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(stored))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to persist NWS cache to {self.cache_path}: {e}")
+    
+    @staticmethod
+    def _key(lat: float, lon: float) -> Tuple[float, float]:
+        """
+        Build the cache key for a coordinate pair.
+        
+        Coordinates are rounded to 2 decimal places (~1.1 km), finer than the
+        ~2.5 km NWS forecast grid, so nearby coordinates (and float jitter such
+        as 42.3601000001 vs 42.3601) share an entry.
+        """
+        return (round(lat, 2), round(lon, 2))
     
     def get_cached_points(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
         """
@@ -34,50 +117,177 @@ class NWSCache:
             lon: Longitude
             
         Returns:
-            Cached points data if available and valid, None otherwise
+            Cached points data if available and valid, None otherwise. The
+            returned dict is shared with the cache and must not be mutated.
         """
-        cache_key = (lat, lon)
-        
-        if cache_key not in self.points_cache:
-            logger.debug(f"No cached points data for coordinates ({lat}, {lon})")
-            return None
-        
-        cached_entry = self.points_cache[cache_key]
-        timestamp = cached_entry.get('_cached_at', 0)
+        cache_key = self._key(lat, lon)
         
-        if self._is_expired(timestamp):
-            logger.debug(f"Cached points data expired for coordinates ({lat}, {lon})")
-            # Remove expired entry
-            del self.points_cache[cache_key]
-            return None
+        with self._lock:
+            # Drop entries that have expired for any coordinates, this one
+            # included; checking the heap's head is O(1) when nothing has.
+            # Every live entry has a heap item with its current expiry, so
+            # whatever remains is valid.
+            self._evict_expired(self._now())
+            
+            entry = self.points_cache.get(cache_key)
+            if entry is None:
+                logger.debug(f"No cached points data for coordinates ({lat}, {lon})")
+                return None
+            
+            _, data = entry
+            self.points_cache.move_to_end(cache_key)
         
         logger.debug(f"Using cached points data for coordinates ({lat}, {lon})")
-        # Return data without the internal timestamp
-        data = cached_entry.copy()
-        data.pop('_cached_at', None)
         return data
     
-    def cache_points_data(self, lat: float, lon: float, data: Dict[str, Any]) -> None:
+    def _evict_expired(self, now: float) -> int:
+        """
+        Remove every expired points entry, popping the expiry heap in order.
+        Callers must hold the lock.
+        
+        Returns:
+            Number of entries removed
+        """
+        heap = self._expiry_heap
+        removed = 0
+        while heap and now > heap[0][0]:
+            _, cache_key = heapq.heappop(heap)
+            entry = self.points_cache.get(cache_key)
+            # Skip items for entries since overwritten with a later expiry
+            if entry is not None and now > entry[0]:
+                del self.points_cache[cache_key]
+                removed += 1
+        
+        if removed:
+            self._save()
+            logger.debug(f"Evicted {removed} expired cache entries")
+        
+        return removed
+    
+    def _evict_lru(self) -> None:
+        """Evict least recently used points entries beyond max_entries (lock held)."""
+        while len(self.points_cache) > self.max_entries:
+            # Its expiry heap item goes stale and is skipped when popped
+            self.points_cache.popitem(last=False)
+    
+    def _rebuild_expiry_heap(self) -> None:
+        """Rebuild the expiry heap from the live entries, dropping stale items (lock held)."""
+        self._expiry_heap = [
+            (expires_at, cache_key) for cache_key, (expires_at, _) in self.points_cache.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+    
+    def cache_points_data(self, lat: float, lon: float, data: Dict[str, Any],
+                          ttl: Optional[float] = None) -> None:
         """
-        Cache points data with timestamp.
+        Cache points data with an expiry time.
         
         Args:
             lat: Latitude
             lon: Longitude
             data: Points data to cache
+            ttl: Time-to-live in seconds for this entry, e.g. from the
+                response's Cache-Control max-age. Defaults to cache_ttl.
         """
-        cache_key = (lat, lon)
+        cache_key = self._key(lat, lon)
+        if ttl is None:
+            ttl = self.cache_ttl
+        expires_at = self._now() + ttl
+        with self._lock:
+            self.points_cache[cache_key] = (expires_at, data)
+            self.points_cache.move_to_end(cache_key)
+            self._evict_lru()
+            heapq.heappush(self._expiry_heap, (expires_at, cache_key))
+            # Refreshing entries leaves stale heap items behind; compact the
+            # heap before they outnumber the live ones
+            if len(self._expiry_heap) > 2 * len(self.points_cache) + 64:
+                self._rebuild_expiry_heap()
+            self._save()
+        logger.debug(f"Cached points data for coordinates ({lat}, {lon})")
+    
+    def get_cached_station(self, lat: float, lon: float) -> Optional[str]:
+        """
+        Get the observation station previously resolved for a location.
         
-        # Add internal timestamp to the data
-        cached_data = data.copy()
-        cached_data['_cached_at'] = time.time()
+        Args:
+            lat: Latitude
+            lon: Longitude
+            
+        Returns:
+            Station identifier if cached and not expired, None otherwise
+        """
+        cache_key = self._key(lat, lon)
+        with self._lock:
+            entry = self.station_cache.get(cache_key)
+            if entry is None:
+                return None
+            
+            expires_at, station_id = entry
+            if self._now() > expires_at:
+                del self.station_cache[cache_key]
+                return None
+            
+            return station_id
+    
+    def cache_station(self, lat: float, lon: float, station_id: str) -> None:
+        """
+        Cache the observation station resolved for a location.
         
-        self.points_cache[cache_key] = cached_data
-        logger.debug(f"Cached points data for coordinates ({lat}, {lon})")
+        Args:
+            lat: Latitude
+            lon: Longitude
+            station_id: NWS station identifier (e.g. 'KBOS')
+        """
+        with self._lock:
+            self.station_cache[self._key(lat, lon)] = (self._now() + self.station_ttl, station_id)
+    
+    def invalidate_station(self, lat: float, lon: float) -> None:
+        """Forget the cached observation station for a location."""
+        with self._lock:
+            self.station_cache.pop(self._key(lat, lon), None)
+    
+    def is_negative(self, lat: float, lon: float) -> bool:
+        """
+        Check whether a location is cached as outside NWS coverage.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            
+        Returns:
+            True if the location was recently reported as outside coverage
+        """
+        cache_key = self._key(lat, lon)
+        with self._lock:
+            expires_at = self.negative_cache.get(cache_key)
+            if expires_at is None:
+                return False
+            
+            if self._now() > expires_at:
+                del self.negative_cache[cache_key]
+                return False
+            
+            return True
+    
+    def cache_negative_points(self, lat: float, lon: float) -> None:
+        """
+        Remember that a location is outside NWS coverage.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+        """
+        with self._lock:
+            self.negative_cache[self._key(lat, lon)] = self._now() + self.negative_ttl
     
     def clear_cache(self) -> None:
         """Clear all cached data."""
-        self.points_cache.clear()
+        with self._lock:
+            self.points_cache.clear()
+            self._expiry_heap.clear()
+            self.station_cache.clear()
+            self.negative_cache.clear()
+            self._save()
         logger.info("NWS cache cleared")
     
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -87,14 +297,14 @@ class NWSCache:
         Returns:
             Dict containing cache statistics
         """
-        total_entries = len(self.points_cache)
-        expired_entries = 0
-        
-        current_time = time.time()
-        for entry in self.points_cache.values():
-            timestamp = entry.get('_cached_at', 0)
-            if self._is_expired(timestamp):
-                expired_entries += 1
+        # Read the clock once for the whole scan
+        now = self._now()
+        with self._lock:
+            total_entries = len(self.points_cache)
+            expired_entries = sum(
+                1 for expires_at, _ in self.points_cache.values()
+                if now > expires_at
+            )
         
         return {
             'total_entries': total_entries,
@@ -110,17 +320,5 @@ class NWSCache:
         Returns:
             Number of entries removed
         """
-        expired_keys = []
-        
-        for cache_key, cached_entry in self.points_cache.items():
-            timestamp = cached_entry.get('_cached_at', 0)
-            if self._is_expired(timestamp):
-                expired_keys.append(cache_key)
-        
-        for key in expired_keys:
-            del self.points_cache[key]
-        
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
-        
-        return len(expired_keys)
\ No newline at end of file
+        with self._lock:
+            return self._evict_expired(self._now())
@@ -1,9 +1,15 @@
 """
 National Weather Service API client with retry logic and error handling.
 """
+import random
+import re
+import threading
 import time
+import orjson
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, Iterable, Tuple, Type
 from functools import wraps
 import logging
 
@@ -12,28 +18,53 @@ from nws_cache import NWSCache
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on a single retry sleep, whether jittered or server-requested
+MAX_RETRY_DELAY = 60.0
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(response: requests.Response) -> Optional[int]:
+    """Return the Cache-Control max-age of a response in seconds, if present."""
+    cache_control = response.headers.get("Cache-Control")
+    match = _MAX_AGE_RE.search(cache_control) if isinstance(cache_control, str) else None
+    return int(match.group(1)) if match else None
+
+
+def _retry_delay(base_delay: float, attempt: int, error: Exception) -> float:
+    """
+    Compute the sleep before the next retry.
+    
+    Uses "full jitter" (a random delay between 0 and the exponential backoff)
+    so concurrent callers retrying the same outage don't wake up in lockstep,
+    but never sleeps less than a Retry-After the server sent.
+    """
+    delay = random.uniform(0, base_delay * (2 ** attempt))
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, MAX_RETRY_DELAY)
+
 
 def retry_with_exponential_backoff(max_attempts: int = 3, base_delay: float = 1.0):
     """
-    Decorator for retrying functions with exponential backoff.
+    Decorator for retrying functions with jittered exponential backoff.
     
     Args:
         max_attempts: Maximum number of retry attempts
-        base_delay: Base delay in seconds (will be exponentially increased)
+        base_delay: Base delay in seconds (the jitter window doubles per attempt)
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            
+            # Every iteration either returns or raises on the last attempt
             for attempt in range(max_attempts):
                 try:
                     return func(*args, **kwargs)
                 except NWSServiceUnavailableError as e:
-                    last_exception = e
                     if attempt < max_attempts - 1:
-                        delay = base_delay * (2 ** attempt)
-                        logger.warning(f"NWS API unavailable, retrying in {delay}s (attempt {attempt + 1}/{max_attempts})")
+                        delay = _retry_delay(base_delay, attempt, e)
+                        logger.warning(f"NWS API unavailable, retrying in {delay:.2f}s (attempt {attempt + 1}/{max_attempts})")
                         time.sleep(delay)
                     else:
                         logger.error(f"NWS API unavailable after {max_attempts} attempts")
@@ -43,27 +74,54 @@ def retry_with_exponential_backoff(max_attempts: int = 3, base_delay: float = 1.
                     logger.error(f"NWS API error (no retry): {e}")
                     raise
                 except Exception as e:
-                    last_exception = e
                     if attempt < max_attempts - 1:
-                        delay = base_delay * (2 ** attempt)
-                        logger.warning(f"Request failed, retrying in {delay}s (attempt {attempt + 1}/{max_attempts}): {e}")
+                        delay = _retry_delay(base_delay, attempt, e)
+                        logger.warning(f"Request failed, retrying in {delay:.2f}s (attempt {attempt + 1}/{max_attempts}): {e}")
                         time.sleep(delay)
                     else:
                         logger.error(f"Request failed after {max_attempts} attempts: {e}")
                         raise
-            
-            # This should never be reached, but just in case
-            if last_exception:
-                raise last_exception
-                
+        
         return wrapper
     return decorator
 
 
+def _grid_key(lat: float, lon: float) -> Tuple[float, float]:
+    """
+    Quantize coordinates for points metadata caching.
+    
+    Uses the NWSCache key (two decimal places, ~1.1 km, finer than the ~2.5 km
+    NWS forecast grid), so nearby coordinates share a cache entry and a
+    fetch_many grid cell.
+    """
+    return NWSCache._key(lat, lon)
+
+
+def _parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Return the Retry-After header in seconds, if present and numeric."""
+    try:
+        return max(float(response.headers.get("Retry-After")), 0.0)
+    except (TypeError, ValueError):
+        # Missing, or an HTTP date rather than a number of seconds
+        return None
+
+
+# Exception type and message raised for specific NWS error statuses
+_STATUS_MAP: Dict[int, Tuple[Type[NWSAPIError], str]] = {
+    404: (NWSGeographicError, "Location outside NWS coverage area"),
+    503: (NWSServiceUnavailableError, "NWS API temporarily unavailable"),
+    500: (NWSServiceUnavailableError, "NWS API internal server error"),
+    429: (NWSServiceUnavailableError, "NWS API rate limit exceeded"),
+}
+
+
 def handle_nws_error(response: requests.Response) -> None:
     """
     Handle NWS API error responses with appropriate exceptions.
     
+    Service-unavailable errors carry a retry_after attribute (seconds, or
+    None) taken from the Retry-After header, which the retry decorator honors.
+    
     Args:
         response: HTTP response object
         
@@ -72,32 +130,50 @@ def handle_nws_error(response: requests.Response) -> None:
         NWSServiceUnavailableError: When NWS API is temporarily unavailable
         NWSAPIError: For other API-related errors
     """
-    if response.status_code == 404:
-        raise NWSGeographicError("Location outside NWS coverage area")
-    elif response.status_code == 503:
-        raise NWSServiceUnavailableError("NWS API temporarily unavailable")
-    elif response.status_code == 500:
-        raise NWSServiceUnavailableError("NWS API internal server error")
-    elif response.status_code == 429:
-        raise NWSServiceUnavailableError("NWS API rate limit exceeded")
-    elif not response.ok:
-        raise NWSAPIError(f"NWS API error: {response.status_code} - {response.text}")
+    mapped = _STATUS_MAP.get(response.status_code)
+    if mapped is None:
+        if not response.ok:
+            raise NWSAPIError(f"NWS API error: {response.status_code} - {response.text}")
+        return
+    
+    error_cls, message = mapped
+    error = error_cls(message)
+    if error_cls is NWSServiceUnavailableError:
+        error.retry_after = _parse_retry_after(response)
+    raise error
 
 
 class NWSAPIClient:
     """Client for making requests to the National Weather Service API."""
     
-    def __init__(self, cache_ttl: int = 3600):
+    def __init__(self, cache_ttl: int = 3600, time_fn: Callable[[], float] = time.time):
+        """
+        Args:
+            cache_ttl: Points metadata cache TTL in seconds
+            time_fn: Clock for the metadata cache (see NWSCache)
+        """
         self.config = NWSConfig()
         self.session = requests.Session()
+        # Keep enough pooled keep-alive connections for fetch_many fan-out so
+        # concurrent requests don't discard connections and redo TLS handshakes.
+        # Retries stay with retry_with_exponential_backoff.
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=100, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update(self.config.get_headers())
-        self.cache = NWSCache(cache_ttl=cache_ttl)
+        self.cache = NWSCache(cache_ttl=cache_ttl, time_fn=time_fn)
+        # Requests in progress per URL, so concurrent callers share one round-trip
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
     
-    @retry_with_exponential_backoff(max_attempts=NWSConfig.RETRY_ATTEMPTS, base_delay=NWSConfig.RETRY_DELAY)
     def make_request(self, url: str) -> Dict[str, Any]:
         """
         Make a request to the NWS API with proper error handling and retry logic.
         
+        Concurrent calls for the same URL are coalesced: the first caller
+        performs the request and the others wait for and share its result
+        (or exception). The returned dict may be shared and must not be mutated.
+        
         Args:
             url: The API endpoint URL
             
@@ -109,6 +185,37 @@ class NWSAPIClient:
             NWSGeographicError: When location is outside NWS coverage
             NWSServiceUnavailableError: When API is temporarily unavailable
         """
+        return self._request_with_max_age(url)[0]
+    
+    def _request_with_max_age(self, url: str) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        Like make_request, but also return the response's Cache-Control
+        max-age in seconds (None if absent). Coalesced callers share both.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(url)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[url] = Future()
+        
+        if not is_leader:
+            return future.result()
+        
+        try:
+            result = self._request(url)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[url]
+    
+    @retry_with_exponential_backoff(max_attempts=NWSConfig.RETRY_ATTEMPTS, base_delay=NWSConfig.RETRY_DELAY)
+    def _request(self, url: str) -> Tuple[Dict[str, Any], Optional[int]]:
+        """Perform a single NWS API request (with retries), see _request_with_max_age."""
         try:
             logger.debug(f"Making NWS API request to: {url}")
             
@@ -118,9 +225,10 @@ class NWSAPIClient:
             if not response.ok:
                 handle_nws_error(response)
             
-            data = response.json()
+            data = orjson.loads(response.content)
+            
             logger.debug(f"NWS API request successful: {url}")
-            return data
+            return data, _max_age(response)
             
         except requests.exceptions.Timeout:
             raise NWSServiceUnavailableError("NWS API request timed out")
@@ -143,12 +251,49 @@ class NWSAPIClient:
         Returns:
             Dict containing points metadata with forecast URLs
         """
-        # Validate coordinates are within NWS coverage
-        if not self.config.validate_coordinates(lat, lon):
+        return self._fetch_points_metadata(lat, lon)[0]
+    
+    def _fetch_points_metadata(self, lat: float, lon: float) -> Tuple[Dict[str, Any], Optional[int]]:
+        """Fetch points metadata and its Cache-Control max-age, see get_points_metadata."""
+        # Validate coordinates are within NWS coverage, rejecting anything
+        # outside the overall envelope before the per-area checks
+        lat_min, lat_max, lon_min, lon_max = self.config.COVERAGE_ENVELOPE
+        if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max) or \
+                not self.config.validate_coordinates(lat, lon):
             raise NWSGeographicError(f"Coordinates ({lat}, {lon}) are outside NWS coverage area")
         
         url = self.config.get_points_url(lat, lon)
-        return self.make_request(url)
+        return self._request_with_max_age(url)
+    
+    def validate_coordinates_batch(self, lats, lons):
+        """
+        Check many coordinates against NWS coverage at once.
+        
+        Args:
+            lats: Array-like of latitudes
+            lons: Array-like of longitudes (same length as lats)
+            
+        Returns:
+            NumPy boolean array, True where the coordinate is inside coverage
+        """
+        import numpy as np
+        
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        
+        lat_min, lat_max, lon_min, lon_max = self.config.COVERAGE_ENVELOPE
+        mask = np.zeros(lats.shape, dtype=bool)
+        candidates = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+        
+        # Only points inside the envelope go through the per-area checks
+        cand_lats, cand_lons = lats[candidates], lons[candidates]
+        in_area = np.zeros(cand_lats.shape, dtype=bool)
+        for area_lat_min, area_lat_max, area_lon_min, area_lon_max in self.config.COVERAGE_AREAS:
+            in_area |= ((cand_lats >= area_lat_min) & (cand_lats <= area_lat_max) &
+                        (cand_lons >= area_lon_min) & (cand_lons <= area_lon_max))
+        mask[candidates] = in_area
+        
+        return mask
     
     def _get_nws_metadata(self, lat: float, lon: float) -> Dict[str, Any]:
         """
@@ -166,17 +311,28 @@ class NWSAPIClient:
             NWSGeographicError: When coordinates are outside NWS coverage
             NWSAPIError: For other API-related errors
         """
+        grid_lat, grid_lon = _grid_key(lat, lon)
+        
         # Check cache first
-        cached_data = self.cache.get_cached_points(lat, lon)
+        cached_data = self.cache.get_cached_points(grid_lat, grid_lon)
         if cached_data is not None:
             logger.debug(f"Using cached metadata for coordinates ({lat}, {lon})")
             return cached_data
         
+        # Locations already reported as outside coverage skip the round-trip
+        if self.cache.is_negative(grid_lat, grid_lon):
+            raise NWSGeographicError(f"Coordinates ({lat}, {lon}) are outside NWS coverage area")
+        
         # Fetch from API if not cached
-        metadata = self.get_points_metadata(lat, lon)
+        try:
+            metadata, ttl = self._fetch_points_metadata(lat, lon)
+        except NWSGeographicError:
+            self.cache.cache_negative_points(grid_lat, grid_lon)
+            raise
         
-        # Cache the result
-        self.cache.cache_points_data(lat, lon, metadata)
+        # Cache the result for as long as the response allows, falling back
+        # to the cache's own TTL
+        self.cache.cache_points_data(grid_lat, grid_lon, metadata, ttl=ttl)
         
         return metadata
     
@@ -197,13 +353,19 @@ class NWSAPIClient:
         """
         return self.make_request(url)
     
-    def _fetch_current_conditions(self, lat: float, lon: float) -> Dict[str, Any]:
+    def _observations_url(self, station_id: str) -> str:
+        """Build the latest-observation URL for a station."""
+        return f"{self.config.BASE_URL}/stations/{station_id}/observations/latest"
+    
+    def _fetch_current_conditions(self, lat: float, lon: float,
+                                  metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Fetch current weather conditions from NWS API.
         
         Args:
             lat: Latitude
             lon: Longitude
+            metadata: Points metadata already fetched for this location
             
         Returns:
             Dict containing current weather observations
@@ -211,8 +373,19 @@ class NWSAPIClient:
         Raises:
             NWSAPIError: For API-related errors
         """
+        # Reuse the station that answered last time, skipping the stations list
+        station_id = self.cache.get_cached_station(lat, lon)
+        if station_id:
+            try:
+                return self._make_nws_request(self._observations_url(station_id))
+            except NWSAPIError as e:
+                # Station may have been decommissioned; reselect from the list
+                logger.debug(f"Cached station {station_id} failed, reselecting: {e}")
+                self.cache.invalidate_station(lat, lon)
+        
         # First get the metadata to find the observation station
-        metadata = self._get_nws_metadata(lat, lon)
+        if metadata is None:
+            metadata = self._get_nws_metadata(lat, lon)
         
         # Extract the observation stations URL from metadata
         properties = metadata.get('properties', {})
@@ -233,21 +406,24 @@ class NWSAPIClient:
             try:
                 station_id = station.get('properties', {}).get('stationIdentifier')
                 if station_id:
-                    observations_url = f"{self.config.BASE_URL}/stations/{station_id}/observations/latest"
-                    return self._make_nws_request(observations_url)
+                    observations = self._make_nws_request(self._observations_url(station_id))
+                    self.cache.cache_station(lat, lon, station_id)
+                    return observations
             except (NWSAPIError, NWSServiceUnavailableError):
                 # Try next station if this one fails
                 continue
         
         raise NWSAPIError("Unable to fetch current conditions from any observation station")
     
-    def _fetch_hourly_forecast(self, lat: float, lon: float) -> Dict[str, Any]:
+    def _fetch_hourly_forecast(self, lat: float, lon: float,
+                               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Fetch hourly forecast data from NWS API.
         
         Args:
             lat: Latitude
             lon: Longitude
+            metadata: Points metadata already fetched for this location
             
         Returns:
             Dict containing hourly forecast data
@@ -256,7 +432,8 @@ class NWSAPIClient:
             NWSAPIError: For API-related errors
         """
         # Get metadata to find forecast URLs
-        metadata = self._get_nws_metadata(lat, lon)
+        if metadata is None:
+            metadata = self._get_nws_metadata(lat, lon)
         
         # Extract the hourly forecast URL
         properties = metadata.get('properties', {})
@@ -267,13 +444,15 @@ class NWSAPIClient:
         
         return self._make_nws_request(forecast_hourly_url)
     
-    def _fetch_daily_forecast(self, lat: float, lon: float) -> Dict[str, Any]:
+    def _fetch_daily_forecast(self, lat: float, lon: float,
+                              metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Fetch daily forecast data from NWS API.
         
         Args:
             lat: Latitude
             lon: Longitude
+            metadata: Points metadata already fetched for this location
             
         Returns:
             Dict containing daily forecast data
@@ -282,7 +461,8 @@ class NWSAPIClient:
             NWSAPIError: For API-related errors
         """
         # Get metadata to find forecast URLs
-        metadata = self._get_nws_metadata(lat, lon)
+        if metadata is None:
+            metadata = self._get_nws_metadata(lat, lon)
         
         # Extract the daily forecast URL
         properties = metadata.get('properties', {})
@@ -293,6 +473,95 @@ class NWSAPIClient:
         
         return self._make_nws_request(forecast_url)
     
+    def fetch_all(self, lat: float, lon: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch current conditions, hourly and daily forecasts for one location.
+        
+        The points metadata is resolved once and shared by the three fetches,
+        which then run concurrently.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            
+        Returns:
+            Dict with 'current', 'hourly' and 'daily' response data
+            
+        Raises:
+            NWSAPIError: If any of the three fetches fails
+        """
+        metadata = self._get_nws_metadata(lat, lon)
+        
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="nws-client") as executor:
+            futures = {
+                'current': executor.submit(self._fetch_current_conditions, lat, lon, metadata),
+                'hourly': executor.submit(self._fetch_hourly_forecast, lat, lon, metadata),
+                'daily': executor.submit(self._fetch_daily_forecast, lat, lon, metadata),
+            }
+            return {kind: future.result() for kind, future in futures.items()}
+    
+    def fetch_many(self, points: Iterable[Tuple[float, float]], kind: str = 'hourly',
+                   max_workers: int = 8) -> Dict[Tuple[float, float], Dict[str, Any]]:
+        """
+        Fetch one kind of weather data for many coordinates concurrently.
+        
+        The per-point fetches are I/O bound, so running them on a thread pool
+        overlaps their network round-trips instead of paying them one by one.
+        
+        Args:
+            points: (lat, lon) pairs to fetch
+            kind: 'current', 'hourly' or 'daily'
+            max_workers: Maximum number of concurrent requests
+            
+        Returns:
+            Dict mapping each (lat, lon) that succeeded to its response data.
+            Points that fail (including their grid cell's metadata lookup)
+            are logged and left out.
+        """
+        fetchers = {
+            'current': self._fetch_current_conditions,
+            'hourly': self._fetch_hourly_forecast,
+            'daily': self._fetch_daily_forecast,
+        }
+        if kind not in fetchers:
+            raise ValueError(f"Unknown fetch kind: {kind}")
+        fetch = fetchers[kind]
+        
+        points = list(dict.fromkeys(points))
+        
+        # Nearby points share a grid cell and therefore the same points
+        # metadata; resolve it once per cell before fanning out
+        cell_points = {}
+        for point in points:
+            cell_points.setdefault(_grid_key(*point), point)
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nws-client") as executor:
+            metadata_futures = {
+                cell: executor.submit(self._get_nws_metadata, *point)
+                for cell, point in cell_points.items()
+            }
+            metadata = {}
+            for cell, future in metadata_futures.items():
+                try:
+                    metadata[cell] = future.result()
+                except NWSAPIError as e:
+                    logger.error(f"Failed to fetch NWS metadata for grid cell {cell}: {e}")
+            
+            futures = {}
+            for point in points:
+                cell = _grid_key(*point)
+                if cell in metadata:
+                    futures[point] = executor.submit(fetch, *point, metadata[cell])
+            
+            for point, future in futures.items():
+                try:
+                    results[point] = future.result()
+                except NWSAPIError as e:
+                    logger.error(f"Failed to fetch NWS {kind} data for {point}: {e}")
+        
+        return results
+    
     def close(self):
         """Close the HTTP session."""
         self.session.close()
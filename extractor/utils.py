@@ -2,42 +2,144 @@
 Utility functions for the Boston Weather ETL Pipeline.
 """
 import duckdb
-import pandas as pd
+import functools
+import itertools
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import structlog
 from config import DatabaseConfig
 import re
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Arrow types matching the table schemas (REAL is 32-bit in DuckDB), so insert
+# batches are built with the right types instead of inferred per column.
+# Timestamp/date columns are left to inference to keep their timezone.
+if pa is not None:
+    _ARROW_TYPES = {
+        'temp': pa.float32(), 'feels_like': pa.float32(),
+        'temp_min': pa.float32(), 'temp_max': pa.float32(),
+        'temp_day': pa.float32(), 'temp_night': pa.float32(),
+        'wind_speed': pa.float32(), 'pop': pa.float32(),
+        'humidity': pa.int32(), 'pressure': pa.int32(), 'wind_deg': pa.int32(),
+        'description': pa.string(), 'icon': pa.string(),
+    }
+
 logger = structlog.get_logger()
 
+# Compass points used in NWS forecast windDirection, in degrees
+_WIND_DIR_MAP = {
+    'N': 0, 'NNE': 22, 'NE': 45, 'ENE': 67,
+    'E': 90, 'ESE': 112, 'SE': 135, 'SSE': 157,
+    'S': 180, 'SSW': 202, 'SW': 225, 'WSW': 247,
+    'W': 270, 'WNW': 292, 'NW': 315, 'NNW': 337
+}
+
+# First number (fallback for _parse_wind_mph) in an NWS forecast windSpeed such as "10 mph" or "5 to 10 mph"
+_WIND_SPEED_RE = re.compile(r'(\d+(?:\.\d+)?)')
+
+# Description keywords mapped to weather icon codes, in priority order
+_ICON_KEYWORDS = (
+    ("clear", "01d"), ("sunny", "01d"),
+    ("few clouds", "02d"), ("partly cloudy", "02d"),
+    ("scattered clouds", "03d"),
+    ("broken clouds", "04d"), ("overcast", "04d"),
+    ("shower", "09d"), ("light rain", "09d"),
+    ("rain", "10d"),
+    ("thunderstorm", "11d"),
+    ("snow", "13d"),
+    ("mist", "50d"), ("fog", "50d"),
+)
+
+# Required fields for response validation
+_REQUIRED_API_FIELDS = frozenset({'current', 'hourly', 'daily'})
+_REQUIRED_CURRENT_FIELDS = frozenset({
+    'dt', 'temp', 'feels_like', 'humidity', 'pressure', 'wind_speed', 'wind_deg', 'weather'
+})
+_REQUIRED_POINTS_FIELDS = frozenset({'forecast', 'forecastHourly'})
+
+# Single-row insert for current conditions; binding one tuple is cheaper than
+# building a batch for it
+_CURRENT_WEATHER_INSERT = (
+    f"INSERT INTO current_weather ({', '.join(DatabaseConfig.CURRENT_WEATHER_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(DatabaseConfig.CURRENT_WEATHER_COLUMNS))})"
+)
+
+
+def configure_connection(connection: duckdb.DuckDBPyConnection) -> None:
+    """Apply DatabaseConfig.SETTINGS to a DuckDB connection."""
+    for name, value in DatabaseConfig.SETTINGS.items():
+        if isinstance(value, bool):
+            literal = 'true' if value else 'false'
+        elif isinstance(value, str):
+            literal = "'" + value.replace("'", "''") + "'"
+        else:
+            literal = str(value)
+        connection.execute(f"SET {name} = {literal}")
+
+
+def connect_database(db_path: str) -> duckdb.DuckDBPyConnection:
+    """Open a DuckDB connection configured with DatabaseConfig.SETTINGS."""
+    connection = duckdb.connect(db_path)
+    configure_connection(connection)
+    return connection
+
 
 class DatabaseManager:
     """Manages DuckDB database operations."""
     
-    def __init__(self, db_path: str):
+    # Weather tables: (columns, key column that newer rows replace on, if any)
+    _TABLES = {
+        'current_weather': (DatabaseConfig.CURRENT_WEATHER_COLUMNS, None),
+        'hourly_weather': (DatabaseConfig.HOURLY_WEATHER_COLUMNS, 'timestamp'),
+        'daily_weather': (DatabaseConfig.DAILY_WEATHER_COLUMNS, 'date'),
+    }
+    
+    def __init__(self, db_path: str, connection: Optional[duckdb.DuckDBPyConnection] = None):
+        """
+        Args:
+            db_path: Path to the DuckDB database file
+            connection: Optional long-lived connection to reuse. When given, the
+                context manager works on its own cursor of that connection
+                (safe to use from another thread) and closes only the cursor.
+        """
         self.db_path = db_path
-        self.connection = None
+        self.connection = connection
+        self._shared_connection = connection
+        self._owns_connection = connection is None
     
     def __enter__(self):
-        self.connection = duckdb.connect(self.db_path)
+        if self._owns_connection:
+            self.connection = connect_database(self.db_path)
+        else:
+            self.connection = self._shared_connection.cursor()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.connection:
             self.connection.close()
+        self.connection = self._shared_connection
     
-    def initialize_database(self):
-        """Initialize database tables and indexes."""
+    def initialize_database(self, defer_indexes: bool = False):
+        """
+        Initialize database tables and indexes.
+        
+        Args:
+            defer_indexes: Only create the tables. The caller is expected to run
+                create_indexes() once the initial load is done, so the indexes
+                are built once over the loaded data instead of per insert.
+        """
         try:
             # Create tables
             self.connection.execute(DatabaseConfig.CURRENT_WEATHER_SCHEMA)
             self.connection.execute(DatabaseConfig.HOURLY_WEATHER_SCHEMA)
             self.connection.execute(DatabaseConfig.DAILY_WEATHER_SCHEMA)
             
-            # Create indexes
-            for index_sql in DatabaseConfig.INDEXES:
-                self.connection.execute(index_sql)
+            if not defer_indexes:
+                self.create_indexes()
             
             logger.info("Database initialized successfully")
             
@@ -45,13 +147,128 @@ class DatabaseManager:
             logger.error(f"Failed to initialize database: {e}")
             raise
     
+    def create_indexes(self):
+        """Create the query indexes defined in DatabaseConfig."""
+        for index_sql in DatabaseConfig.INDEXES:
+            self.connection.execute(index_sql)
+    
+    def begin(self):
+        """Start an explicit transaction."""
+        self.connection.begin()
+    
+    def commit(self):
+        """Commit the current transaction."""
+        self.connection.commit()
+    
+    def rollback(self):
+        """Roll back the current transaction."""
+        self.connection.rollback()
+    
+    def _bulk_insert(self, table: str, columns: Tuple[str, ...], data_list: List[Dict[str, Any]],
+                     key_column: Optional[str] = None):
+        """
+        Append a batch of rows to a table.
+        
+        With pyarrow installed the rows are handed to DuckDB as an Arrow table
+        and appended through the relation API, so the batch streams straight
+        into the table's column storage. Without it the rows are inserted as
+        plain tuples with executemany. columns must be in table order.
+        
+        When key_column is given the batch replaces existing rows with the same
+        key: it is appended to a temp staging table, matching rows are deleted
+        and the staged rows inserted sorted on the key. Run this inside a
+        transaction (see begin/commit) so readers never see the intermediate state.
+        """
+        column_list = ", ".join(columns)
+        
+        if key_column is None:
+            self._append_rows(table, columns, data_list)
+            return
+        
+        # Stage with the target's column types, then merge sorted on the key
+        stage_name = f"stage_{table}"
+        self.connection.execute(
+            f"CREATE OR REPLACE TEMP TABLE {stage_name} AS SELECT {column_list} FROM {table} LIMIT 0"
+        )
+        self._append_rows(stage_name, columns, data_list)
+        self._merge_stage(table, stage_name, column_list, key_column)
+    
+    def _merge_stage(self, table: str, stage_name: str, column_list: str, key_column: str):
+        """Replace rows of table keyed in the staging table with the staged rows, then drop it."""
+        self.connection.execute(
+            f"DELETE FROM {table} WHERE {key_column} IN (SELECT {key_column} FROM {stage_name})"
+        )
+        self.connection.execute(
+            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage_name} ORDER BY {key_column}"
+        )
+        self.connection.execute(f"DROP TABLE {stage_name}")
+    
+    def _append_rows(self, table: str, columns: Tuple[str, ...], data_list: List[Dict[str, Any]]):
+        """Append rows (dicts) to a table whose columns are exactly `columns`, in order."""
+        if pa is not None:
+            # Transpose rows into typed columns once; DuckDB scans the Arrow
+            # buffers directly
+            arrow_table = pa.table({
+                column: pa.array([row.get(column) for row in data_list], type=_ARROW_TYPES.get(column))
+                for column in columns
+            })
+            self.connection.from_arrow(arrow_table).insert_into(table)
+        else:
+            placeholders = ", ".join("?" * len(columns))
+            self.connection.executemany(
+                f"INSERT INTO {table} VALUES ({placeholders})",
+                [tuple(row.get(column) for column in columns) for row in data_list]
+            )
+    
+    def bulk_load_from_json(self, path: str, table: str) -> int:
+        """
+        Load rows from a JSON file straight into a weather table.
+        
+        For backfills and replays of transformed rows dumped to disk (a JSON
+        array or newline-delimited objects keyed by column name): DuckDB reads
+        and casts the file itself via read_json_auto, so no rows pass through
+        Python. Hourly/daily rows replace existing rows with the same key, as
+        with insert_hourly_weather/insert_daily_weather.
+        
+        Returns:
+            Number of rows loaded
+        """
+        if table not in self._TABLES:
+            raise ValueError(f"Unknown weather table: {table}")
+        columns, key_column = self._TABLES[table]
+        
+        column_list = ", ".join(columns)
+        source = "read_json_auto('{}')".format(path.replace("'", "''"))
+        
+        try:
+            # DuckDB reports the inserted row count as the INSERT's result
+            if key_column is None:
+                count = self.connection.execute(
+                    f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {source}"
+                ).fetchone()[0]
+            else:
+                stage_name = f"stage_{table}"
+                self.connection.execute(
+                    f"CREATE OR REPLACE TEMP TABLE {stage_name} AS SELECT {column_list} FROM {table} LIMIT 0"
+                )
+                count = self.connection.execute(
+                    f"INSERT INTO {stage_name} SELECT {column_list} FROM {source}"
+                ).fetchone()[0]
+                self._merge_stage(table, stage_name, column_list, key_column)
+            
+            logger.info(f"Loaded {count} {table} records from {path}")
+            return count
+            
+        except Exception as e:
+            logger.error(f"Failed to load {table} data from {path}: {e}")
+            raise
+    
     def insert_current_weather(self, data: Dict[str, Any]):
         """Insert current weather data into the database."""
         try:
-            df = pd.DataFrame([data])
             self.connection.execute(
-                "INSERT INTO current_weather VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                df.values.tolist()[0]
+                _CURRENT_WEATHER_INSERT,
+                tuple(data.get(column) for column in DatabaseConfig.CURRENT_WEATHER_COLUMNS)
             )
             logger.info("Current weather data inserted successfully")
             
@@ -60,17 +277,14 @@ class DatabaseManager:
             raise
     
     def insert_hourly_weather(self, data_list: List[Dict[str, Any]]):
-        """Insert hourly weather data into the database."""
+        """Insert hourly forecast data, replacing earlier forecasts for the same hours."""
         try:
             if not data_list:
                 logger.warning("No hourly weather data to insert")
                 return
             
-            df = pd.DataFrame(data_list)
-            self.connection.executemany(
-                "INSERT INTO hourly_weather VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                df.values.tolist()
-            )
+            self._bulk_insert('hourly_weather', DatabaseConfig.HOURLY_WEATHER_COLUMNS, data_list,
+                              key_column='timestamp')
             logger.info(f"Inserted {len(data_list)} hourly weather records")
             
         except Exception as e:
@@ -78,17 +292,14 @@ class DatabaseManager:
             raise
     
     def insert_daily_weather(self, data_list: List[Dict[str, Any]]):
-        """Insert daily weather data into the database."""
+        """Insert daily forecast data, replacing earlier forecasts for the same days."""
         try:
             if not data_list:
                 logger.warning("No daily weather data to insert")
                 return
             
-            df = pd.DataFrame(data_list)
-            self.connection.executemany(
-                "INSERT INTO daily_weather VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                df.values.tolist()
-            )
+            self._bulk_insert('daily_weather', DatabaseConfig.DAILY_WEATHER_COLUMNS, data_list,
+                              key_column='date')
             logger.info(f"Inserted {len(data_list)} daily weather records")
             
         except Exception as e:
@@ -125,6 +336,24 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Failed to execute query: {e}")
             return []
+    
+    def execute_query_arrow(self, query: str):
+        """
+        Execute a SQL query and return the result as a pyarrow Table.
+        
+        The result is converted in one columnar pass inside DuckDB, which is
+        much cheaper than building a dict per row for large results.
+        
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        if pa is None:
+            raise ImportError("execute_query_arrow requires pyarrow; install it or use execute_query_df")
+        return self.connection.execute(query).arrow()
+    
+    def execute_query_df(self, query: str):
+        """Execute a SQL query and return the result as a pandas DataFrame."""
+        return self.connection.execute(query).fetch_df()
 
 
 def parse_timestamp(timestamp: int) -> datetime:
@@ -205,23 +434,16 @@ def extract_weather_data(api_response: Dict[str, Any]) -> Dict[str, List[Dict[st
 
 def validate_api_response(response: Dict[str, Any]) -> bool:
     """Validate the API response structure."""
-    required_fields = ['current', 'hourly', 'daily']
-    
-    for field in required_fields:
-        if field not in response:
-            logger.error(f"Missing required field in API response: {field}")
-            return False
+    missing = _REQUIRED_API_FIELDS.difference(response)
+    if missing:
+        logger.error(f"Missing required field in API response: {', '.join(sorted(missing))}")
+        return False
     
     # Validate current weather structure
-    if 'current' in response:
-        current = response['current']
-        required_current_fields = ['dt', 'temp', 'feels_like', 'humidity', 
-                                 'pressure', 'wind_speed', 'wind_deg', 'weather']
-        
-        for field in required_current_fields:
-            if field not in current:
-                logger.error(f"Missing required field in current weather: {field}")
-                return False
+    missing = _REQUIRED_CURRENT_FIELDS.difference(response['current'])
+    if missing:
+        logger.error(f"Missing required field in current weather: {', '.join(sorted(missing))}")
+        return False
     
     logger.info("API response validation successful")
     return True
@@ -242,27 +464,27 @@ def format_weather_description(weather_data: Dict[str, Any]) -> str:
         return "Weather data unavailable"
 
 
-def calculate_api_usage_stats() -> Dict[str, Any]:
-    """Calculate API usage statistics."""
+def calculate_api_usage_stats(db_path: str = "/data/weather.db",
+                              connection: Optional[duckdb.DuckDBPyConnection] = None) -> Dict[str, Any]:
+    """
+    Calculate API usage statistics.
+    
+    Args:
+        db_path: Database to open when no connection is given
+        connection: Optional open connection to reuse instead of connecting
+    """
     try:
-        with DatabaseManager("/data/weather.db") as db:
-            # Count records by type
-            current_count = db.connection.execute(
-                "SELECT COUNT(*) FROM current_weather"
-            ).fetchone()[0]
-            
-            hourly_count = db.connection.execute(
-                "SELECT COUNT(*) FROM hourly_weather"
-            ).fetchone()[0]
-            
-            daily_count = db.connection.execute(
-                "SELECT COUNT(*) FROM daily_weather"
-            ).fetchone()[0]
-            
-            # Get latest update time
-            latest_update = db.connection.execute(
-                "SELECT MAX(timestamp) FROM current_weather"
-            ).fetchone()[0]
+        with DatabaseManager(db_path, connection) as db:
+            # Record counts and latest update time in a single round-trip
+            current_count, hourly_count, daily_count, latest_update = db.connection.execute(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM current_weather),
+                    (SELECT COUNT(*) FROM hourly_weather),
+                    (SELECT COUNT(*) FROM daily_weather),
+                    (SELECT MAX(timestamp) FROM current_weather)
+                """
+            ).fetchone()
             
             return {
                 'current_records': current_count,
@@ -279,6 +501,76 @@ def calculate_api_usage_stats() -> Dict[str, Any]:
 
 # NWS Data Transformation Functions
 
+def _validate_nws_points(response: Dict[str, Any], response_type: str) -> bool:
+    """Validate the structure of an NWS points response."""
+    if 'properties' not in response:
+        logger.error("NWS points response missing 'properties' field")
+        return False
+    
+    missing = _REQUIRED_POINTS_FIELDS.difference(response['properties'])
+    if missing:
+        logger.error(f"NWS points response missing required field: {', '.join(sorted(missing))}")
+        return False
+    return True
+
+
+def _validate_nws_current(response: Dict[str, Any], response_type: str) -> bool:
+    """Validate the structure of an NWS latest-observation response."""
+    if 'properties' not in response:
+        logger.error("NWS current conditions response missing 'properties' field")
+        return False
+    
+    # Temperature is the most critical field for current conditions
+    if 'temperature' not in response['properties']:
+        logger.error("NWS current conditions response missing temperature")
+        return False
+    return True
+
+
+def _validate_nws_forecast(response: Dict[str, Any], response_type: str) -> bool:
+    """Validate the structure of an NWS hourly or daily forecast response."""
+    if 'properties' not in response:
+        logger.error(f"NWS {response_type} forecast response missing 'properties' field")
+        return False
+    
+    properties = response['properties']
+    if 'periods' not in properties:
+        logger.error(f"NWS {response_type} forecast response missing 'periods' field")
+        return False
+    
+    if not isinstance(properties['periods'], list):
+        logger.error(f"NWS {response_type} forecast 'periods' is not a list")
+        return False
+    return True
+
+
+_NWS_VALIDATORS = {
+    'points': _validate_nws_points,
+    'current': _validate_nws_current,
+    'hourly': _validate_nws_forecast,
+    'daily': _validate_nws_forecast,
+}
+
+
+def _validated_properties(response: Dict[str, Any], response_type: str) -> Optional[Dict[str, Any]]:
+    """Validate an NWS response and return its 'properties', or None if invalid."""
+    try:
+        if not isinstance(response, dict):
+            logger.error(f"NWS {response_type} response is not a dictionary")
+            return None
+        
+        validator = _NWS_VALIDATORS.get(response_type)
+        if validator is not None and not validator(response, response_type):
+            return None
+        
+        logger.debug(f"NWS {response_type} response validation successful")
+        return response.get('properties', {})
+        
+    except Exception as e:
+        logger.error(f"Failed to validate NWS {response_type} response: {e}")
+        return None
+
+
 def validate_nws_response(response: Dict[str, Any], response_type: str) -> bool:
     """
     Validate NWS API response structure.
@@ -290,57 +582,93 @@ def validate_nws_response(response: Dict[str, Any], response_type: str) -> bool:
     Returns:
         bool: True if response is valid, False otherwise
     """
+    return _validated_properties(response, response_type) is not None
+
+
+def _parse_nws_ts(value: str) -> datetime:
+    """
+    Parse an NWS timestamp.
+    
+    NWS timestamps are ISO-8601 with an offset (e.g. 2024-01-15T14:00:00-05:00),
+    which datetime.fromisoformat handles directly; dateutil's general-purpose
+    parser is only imported and used for anything it rejects.
+    """
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
     try:
-        if not isinstance(response, dict):
-            logger.error(f"NWS {response_type} response is not a dictionary")
-            return False
-        
-        if response_type == 'points':
-            # Validate points response structure
-            if 'properties' not in response:
-                logger.error("NWS points response missing 'properties' field")
-                return False
-            
-            properties = response['properties']
-            required_fields = ['forecast', 'forecastHourly']
-            for field in required_fields:
-                if field not in properties:
-                    logger.error(f"NWS points response missing required field: {field}")
-                    return False
-        
-        elif response_type == 'current':
-            # Validate current conditions response structure
-            if 'properties' not in response:
-                logger.error("NWS current conditions response missing 'properties' field")
-                return False
-            
-            properties = response['properties']
-            # Temperature is the most critical field for current conditions
-            if 'temperature' not in properties:
-                logger.error("NWS current conditions response missing temperature")
-                return False
-        
-        elif response_type in ['hourly', 'daily']:
-            # Validate forecast response structure
-            if 'properties' not in response:
-                logger.error(f"NWS {response_type} forecast response missing 'properties' field")
-                return False
-            
-            properties = response['properties']
-            if 'periods' not in properties:
-                logger.error(f"NWS {response_type} forecast response missing 'periods' field")
-                return False
-            
-            if not isinstance(properties['periods'], list):
-                logger.error(f"NWS {response_type} forecast 'periods' is not a list")
-                return False
-        
-        logger.debug(f"NWS {response_type} response validation successful")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to validate NWS {response_type} response: {e}")
-        return False
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            from dateutil.parser import parse
+        except ImportError:
+            raise ValueError(f"Unrecognised timestamp: {value}") from None
+        return parse(value)
+
+
+def _extract_value_unit(properties: Dict[str, Any], key: str,
+                        default_unit: Optional[str]) -> Tuple[Any, Optional[str]]:
+    """
+    Get the value and unit code of an NWS quantitative property.
+    
+    Returns (None, default_unit) when the property is missing or not a
+    {"value": ..., "unitCode": ...} object.
+    """
+    quantity = properties.get(key)
+    if isinstance(quantity, dict):
+        return quantity.get('value'), quantity.get('unitCode', default_unit)
+    return None, default_unit
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """Truncate a numeric value to int, or None if missing or not numeric."""
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_wind_mph(wind_speed: Any) -> Optional[float]:
+    """
+    Get the (first) speed from an NWS forecast windSpeed such as "10 mph" or
+    "5 to 10 mph", or None if there is none.
+    """
+    if not wind_speed or not isinstance(wind_speed, str):
+        return None
+    # Nearly every value starts with a whole number followed by a space
+    head = wind_speed.partition(' ')[0]
+    if head.isdigit() and head.isascii():
+        return float(head)
+    wind_match = _WIND_SPEED_RE.search(wind_speed)
+    return float(wind_match.group(1)) if wind_match else None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Parse a non-numeric value (e.g. a string) as float, or None if it isn't one."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+# Unit conversions as (offset, multiplier, divisor), applied as
+# (value + offset) * multiplier / divisor so each result matches the
+# original per-unit formula exactly
+_TEMPERATURE_UNITS = {
+    "wmoUnit:degC": (0.0, 1.0, 1.0),
+    "wmoUnit:degF": (-32.0, 5.0, 9.0),     # Fahrenheit to Celsius
+    "wmoUnit:K": (-273.15, 1.0, 1.0),      # Kelvin to Celsius
+}
+_PRESSURE_UNITS = {
+    "wmoUnit:Pa": (0.0, 1.0, 100.0),       # Pascals to hectopascals (hPa)
+    "wmoUnit:hPa": (0.0, 1.0, 1.0),
+}
+_WIND_SPEED_UNITS = {
+    "wmoUnit:m_s-1": (0.0, 1.0, 1.0),
+    "wmoUnit:km_h-1": (0.0, 1.0, 3.6),     # km/h to m/s
+    "wmoUnit:mi_h-1": (0.0, 0.44704, 1.0), # mph to m/s
+}
 
 
 def _convert_temperature(temp_value: Optional[float], unit_code: str = "wmoUnit:degC") -> Optional[float]:
@@ -357,21 +685,21 @@ def _convert_temperature(temp_value: Optional[float], unit_code: str = "wmoUnit:
     if temp_value is None:
         return None
     
-    try:
-        if unit_code == "wmoUnit:degC":
-            return float(temp_value)
-        elif unit_code == "wmoUnit:degF":
-            # Convert Fahrenheit to Celsius
-            return (float(temp_value) - 32) * 5.0 / 9.0
-        elif unit_code == "wmoUnit:K":
-            # Convert Kelvin to Celsius
-            return float(temp_value) - 273.15
-        else:
-            logger.warning(f"Unknown temperature unit: {unit_code}, assuming Celsius")
-            return float(temp_value)
-    except (ValueError, TypeError):
-        logger.error(f"Failed to convert temperature: {temp_value} {unit_code}")
-        return None
+    # NWS sends numbers; only parse when something else slips through
+    if not isinstance(temp_value, (int, float)):
+        parsed = _to_float(temp_value)
+        if parsed is None:
+            logger.error(f"Failed to convert temperature: {temp_value} {unit_code}")
+            return None
+        temp_value = parsed
+    
+    factors = _TEMPERATURE_UNITS.get(unit_code)
+    if factors is None:
+        logger.warning(f"Unknown temperature unit: {unit_code}, assuming Celsius")
+        factors = _TEMPERATURE_UNITS["wmoUnit:degC"]
+    
+    offset, multiplier, divisor = factors
+    return (temp_value + offset) * multiplier / divisor
 
 
 def _convert_pressure(pressure_value: Optional[float], unit_code: str = "wmoUnit:Pa") -> Optional[int]:
@@ -388,18 +716,21 @@ def _convert_pressure(pressure_value: Optional[float], unit_code: str = "wmoUnit
     if pressure_value is None:
         return None
     
-    try:
-        if unit_code == "wmoUnit:Pa":
-            # Convert Pascals to hectopascals (hPa)
-            return int(float(pressure_value) / 100)
-        elif unit_code == "wmoUnit:hPa":
-            return int(float(pressure_value))
-        else:
-            logger.warning(f"Unknown pressure unit: {unit_code}, assuming Pascals")
-            return int(float(pressure_value) / 100)
-    except (ValueError, TypeError):
-        logger.error(f"Failed to convert pressure: {pressure_value} {unit_code}")
-        return None
+    # NWS sends numbers; only parse when something else slips through
+    if not isinstance(pressure_value, (int, float)):
+        parsed = _to_float(pressure_value)
+        if parsed is None:
+            logger.error(f"Failed to convert pressure: {pressure_value} {unit_code}")
+            return None
+        pressure_value = parsed
+    
+    factors = _PRESSURE_UNITS.get(unit_code)
+    if factors is None:
+        logger.warning(f"Unknown pressure unit: {unit_code}, assuming Pascals")
+        factors = _PRESSURE_UNITS["wmoUnit:Pa"]
+    
+    offset, multiplier, divisor = factors
+    return int((pressure_value + offset) * multiplier / divisor)
 
 
 def _convert_wind_speed(wind_value: Optional[float], unit_code: str = "wmoUnit:m_s-1") -> Optional[float]:
@@ -416,27 +747,31 @@ def _convert_wind_speed(wind_value: Optional[float], unit_code: str = "wmoUnit:m
     if wind_value is None:
         return None
     
-    try:
-        if unit_code == "wmoUnit:m_s-1":
-            return float(wind_value)
-        elif unit_code == "wmoUnit:km_h-1":
-            # Convert km/h to m/s
-            return float(wind_value) / 3.6
-        elif unit_code == "wmoUnit:mi_h-1":
-            # Convert mph to m/s
-            return float(wind_value) * 0.44704
-        else:
-            logger.warning(f"Unknown wind speed unit: {unit_code}, assuming m/s")
-            return float(wind_value)
-    except (ValueError, TypeError):
-        logger.error(f"Failed to convert wind speed: {wind_value} {unit_code}")
-        return None
+    # NWS sends numbers; only parse when something else slips through
+    if not isinstance(wind_value, (int, float)):
+        parsed = _to_float(wind_value)
+        if parsed is None:
+            logger.error(f"Failed to convert wind speed: {wind_value} {unit_code}")
+            return None
+        wind_value = parsed
+    
+    factors = _WIND_SPEED_UNITS.get(unit_code)
+    if factors is None:
+        logger.warning(f"Unknown wind speed unit: {unit_code}, assuming m/s")
+        factors = _WIND_SPEED_UNITS["wmoUnit:m_s-1"]
+    
+    offset, multiplier, divisor = factors
+    return (wind_value + offset) * multiplier / divisor
 
 
+@functools.lru_cache(maxsize=256)
 def _map_nws_icon_to_weather_icon(description: str) -> str:
     """
     Map NWS weather description to standard weather icon codes.
     
+    Forecasts repeat a handful of descriptions across all periods, so results
+    are memoized.
+    
     Args:
         description: NWS weather description text
         
@@ -448,27 +783,12 @@ def _map_nws_icon_to_weather_icon(description: str) -> str:
     
     description_lower = description.lower()
     
-    # Map common weather conditions to icon codes
-    if "clear" in description_lower or "sunny" in description_lower:
-        return "01d"
-    elif "few clouds" in description_lower or "partly cloudy" in description_lower:
-        return "02d"
-    elif "scattered clouds" in description_lower:
-        return "03d"
-    elif "broken clouds" in description_lower or "overcast" in description_lower:
-        return "04d"
-    elif "shower" in description_lower or "light rain" in description_lower:
-        return "09d"
-    elif "rain" in description_lower:
-        return "10d"
-    elif "thunderstorm" in description_lower:
-        return "11d"
-    elif "snow" in description_lower:
-        return "13d"
-    elif "mist" in description_lower or "fog" in description_lower:
-        return "50d"
-    else:
-        return "01d"  # Default to clear sky
+    # First keyword in priority order wins, regardless of where it appears
+    for keyword, icon in _ICON_KEYWORDS:
+        if keyword in description_lower:
+            return icon
+    
+    return "01d"  # Default to clear sky
 
 
 def transform_nws_current_weather(nws_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -482,70 +802,40 @@ def transform_nws_current_weather(nws_data: Dict[str, Any]) -> Optional[Dict[str
         Dict matching existing current weather schema or None if transformation fails
     """
     try:
-        if not validate_nws_response(nws_data, 'current'):
+        properties = _validated_properties(nws_data, 'current')
+        if properties is None:
             return None
         
-        properties = nws_data.get('properties', {})
-        
         # Extract temperature data
-        temp_data = properties.get('temperature', {})
-        temp_value = temp_data.get('value') if isinstance(temp_data, dict) else None
-        temp_unit = temp_data.get('unitCode', 'wmoUnit:degC') if isinstance(temp_data, dict) else 'wmoUnit:degC'
+        temp_value, temp_unit = _extract_value_unit(properties, 'temperature', 'wmoUnit:degC')
         temp = _convert_temperature(temp_value, temp_unit)
         
         # Extract feels-like temperature (use heat index or wind chill)
-        feels_like = None
-        heat_index_data = properties.get('heatIndex', {})
-        wind_chill_data = properties.get('windChill', {})
-        
-        if isinstance(heat_index_data, dict) and heat_index_data.get('value') is not None:
-            feels_like = _convert_temperature(
-                heat_index_data.get('value'),
-                heat_index_data.get('unitCode', 'wmoUnit:degC')
-            )
-        elif isinstance(wind_chill_data, dict) and wind_chill_data.get('value') is not None:
-            feels_like = _convert_temperature(
-                wind_chill_data.get('value'),
-                wind_chill_data.get('unitCode', 'wmoUnit:degC')
-            )
+        heat_index_value, heat_index_unit = _extract_value_unit(properties, 'heatIndex', 'wmoUnit:degC')
+        wind_chill_value, wind_chill_unit = _extract_value_unit(properties, 'windChill', 'wmoUnit:degC')
+        
+        if heat_index_value is not None:
+            feels_like = _convert_temperature(heat_index_value, heat_index_unit)
+        elif wind_chill_value is not None:
+            feels_like = _convert_temperature(wind_chill_value, wind_chill_unit)
         else:
             # Fallback to regular temperature if no feels-like data
             feels_like = temp
         
         # Extract humidity
-        humidity_data = properties.get('relativeHumidity', {})
-        humidity = None
-        if isinstance(humidity_data, dict) and humidity_data.get('value') is not None:
-            try:
-                humidity = int(float(humidity_data['value']))
-            except (ValueError, TypeError):
-                humidity = None
+        humidity_value, _ = _extract_value_unit(properties, 'relativeHumidity', None)
+        humidity = _to_int(humidity_value)
         
         # Extract pressure
-        pressure_data = properties.get('barometricPressure', {})
-        pressure = None
-        if isinstance(pressure_data, dict) and pressure_data.get('value') is not None:
-            pressure = _convert_pressure(
-                pressure_data.get('value'),
-                pressure_data.get('unitCode', 'wmoUnit:Pa')
-            )
+        pressure_value, pressure_unit = _extract_value_unit(properties, 'barometricPressure', 'wmoUnit:Pa')
+        pressure = _convert_pressure(pressure_value, pressure_unit)
         
         # Extract wind data
-        wind_speed_data = properties.get('windSpeed', {})
-        wind_speed = None
-        if isinstance(wind_speed_data, dict) and wind_speed_data.get('value') is not None:
-            wind_speed = _convert_wind_speed(
-                wind_speed_data.get('value'),
-                wind_speed_data.get('unitCode', 'wmoUnit:m_s-1')
-            )
+        wind_speed_value, wind_speed_unit = _extract_value_unit(properties, 'windSpeed', 'wmoUnit:m_s-1')
+        wind_speed = _convert_wind_speed(wind_speed_value, wind_speed_unit)
         
-        wind_direction_data = properties.get('windDirection', {})
-        wind_deg = None
-        if isinstance(wind_direction_data, dict) and wind_direction_data.get('value') is not None:
-            try:
-                wind_deg = int(float(wind_direction_data['value']))
-            except (ValueError, TypeError):
-                wind_deg = None
+        wind_direction_value, _ = _extract_value_unit(properties, 'windDirection', None)
+        wind_deg = _to_int(wind_direction_value)
         
         # Extract description
         description = properties.get('textDescription', 'Unknown')
@@ -558,14 +848,7 @@ def transform_nws_current_weather(nws_data: Dict[str, Any]) -> Optional[Dict[str
         timestamp = None
         if timestamp_str:
             try:
-                from dateutil.parser import parse
-                timestamp = parse(timestamp_str)
-            except ImportError:
-                # Fallback to basic ISO format parsing if dateutil not available
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except Exception:
-                    timestamp = datetime.now(timezone.utc)
+                timestamp = _parse_nws_ts(timestamp_str)
             except Exception:
                 timestamp = datetime.now(timezone.utc)
         else:
@@ -602,10 +885,9 @@ def transform_nws_hourly_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, An
         List of dicts matching existing hourly weather schema
     """
     try:
-        if not validate_nws_response(nws_data, 'hourly'):
+        properties = _validated_properties(nws_data, 'hourly')
+        if properties is None:
             return []
-        
-        properties = nws_data.get('properties', {})
         periods = properties.get('periods', [])
         
         transformed_data = []
@@ -618,14 +900,7 @@ def transform_nws_hourly_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, An
                 timestamp = None
                 if start_time_str:
                     try:
-                        from dateutil.parser import parse
-                        timestamp = parse(start_time_str)
-                    except ImportError:
-                        # Fallback to basic ISO format parsing if dateutil not available
-                        try:
-                            timestamp = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-                        except Exception:
-                            continue  # Skip this period if timestamp parsing fails
+                        timestamp = _parse_nws_ts(start_time_str)
                     except Exception:
                         continue  # Skip this period if timestamp parsing fails
                 else:
@@ -658,28 +933,15 @@ def transform_nws_hourly_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, An
                 # Extract wind data
                 wind_speed_str = period.get('windSpeed', '0 mph')
                 wind_speed = None
-                if wind_speed_str:
-                    try:
-                        # Parse wind speed (e.g., "10 mph" or "5 to 10 mph")
-                        import re
-                        wind_match = re.search(r'(\d+(?:\.\d+)?)', wind_speed_str)
-                        if wind_match:
-                            wind_mph = float(wind_match.group(1))
-                            wind_speed = wind_mph * 0.44704  # Convert mph to m/s
-                    except Exception:
-                        wind_speed = None
+                wind_mph = _parse_wind_mph(wind_speed_str)
+                if wind_mph is not None:
+                    wind_speed = wind_mph * 0.44704  # Convert mph to m/s
                 
                 wind_direction = period.get('windDirection', 'N')
                 wind_deg = None
                 if wind_direction:
                     # Convert wind direction to degrees
-                    direction_map = {
-                        'N': 0, 'NNE': 22, 'NE': 45, 'ENE': 67,
-                        'E': 90, 'ESE': 112, 'SE': 135, 'SSE': 157,
-                        'S': 180, 'SSW': 202, 'SW': 225, 'WSW': 247,
-                        'W': 270, 'WNW': 292, 'NW': 315, 'NNW': 337
-                    }
-                    wind_deg = direction_map.get(wind_direction, 0)
+                    wind_deg = _WIND_DIR_MAP.get(wind_direction, 0)
                 
                 # Extract description and icon
                 description = period.get('shortForecast', 'Unknown')
@@ -689,7 +951,8 @@ def transform_nws_hourly_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, An
                 pop = period.get('probabilityOfPrecipitation', {})
                 if isinstance(pop, dict):
                     pop = pop.get('value', 0)
-                if pop is not None:
+                # Missing and 0% values (most periods) skip the float parse
+                if pop:
                     try:
                         pop = float(pop) / 100.0  # Convert percentage to decimal
                     except (ValueError, TypeError):
@@ -724,6 +987,24 @@ def transform_nws_hourly_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, An
         return []
 
 
+def _new_daily_entry(date) -> Dict[str, Any]:
+    """Empty daily forecast row for a date, filled in from its day/night periods."""
+    return {
+        'date': date,
+        'temp_min': None,
+        'temp_max': None,
+        'temp_day': None,
+        'temp_night': None,
+        'humidity': None,
+        'pressure': None,
+        'wind_speed': None,
+        'wind_deg': None,
+        'description': None,
+        'icon': None,
+        'pop': 0.0
+    }
+
+
 def transform_nws_daily_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Transform NWS daily forecast to match existing schema.
@@ -735,14 +1016,16 @@ def transform_nws_daily_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, Any
         List of dicts matching existing daily weather schema
     """
     try:
-        if not validate_nws_response(nws_data, 'daily'):
+        properties = _validated_properties(nws_data, 'daily')
+        if properties is None:
             return []
-        
-        properties = nws_data.get('properties', {})
         periods = properties.get('periods', [])
         
         transformed_data = []
         daily_data_map = {}  # Group day and night periods
+        # Dates are first seen in ascending order unless NWS ever returns
+        # periods out of time order
+        dates_in_order = True
         
         # Process periods and group by date
         for period in periods:
@@ -753,35 +1036,18 @@ def transform_nws_daily_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, Any
                     continue
                 
                 try:
-                    from dateutil.parser import parse
-                    start_time = parse(start_time_str)
-                    date = start_time.date()
-                except ImportError:
-                    # Fallback to basic ISO format parsing if dateutil not available
-                    try:
-                        start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-                        date = start_time.date()
-                    except Exception:
-                        continue
-                except Exception:
+                    date = _parse_nws_ts(start_time_str).date()
+                except (TypeError, ValueError, OverflowError):
                     continue
                 
-                # Initialize daily data if not exists
-                if date not in daily_data_map:
-                    daily_data_map[date] = {
-                        'date': date,
-                        'temp_min': None,
-                        'temp_max': None,
-                        'temp_day': None,
-                        'temp_night': None,
-                        'humidity': None,
-                        'pressure': None,
-                        'wind_speed': None,
-                        'wind_deg': None,
-                        'description': None,
-                        'icon': None,
-                        'pop': 0.0
-                    }
+                # One lookup per period; day and night of a date share an entry
+                entry = daily_data_map.get(date)
+                if entry is None:
+                    if daily_data_map and date < next(reversed(daily_data_map)):
+                        dates_in_order = False
+                    entry = daily_data_map[date] = _new_daily_entry(date)
+                
+                is_daytime = period.get('isDaytime', True)
                 
                 # Extract temperature
                 temp = period.get('temperature')
@@ -794,65 +1060,55 @@ def transform_nws_daily_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, Any
                     else:
                         temp_celsius = float(temp)
                     
-                    # Determine if this is day or night period
-                    is_daytime = period.get('isDaytime', True)
-                    
                     if is_daytime:
-                        daily_data_map[date]['temp_day'] = temp_celsius
-                        daily_data_map[date]['temp_max'] = temp_celsius
+                        entry['temp_day'] = temp_celsius
+                        entry['temp_max'] = temp_celsius
                     else:
-                        daily_data_map[date]['temp_night'] = temp_celsius
-                        daily_data_map[date]['temp_min'] = temp_celsius
+                        entry['temp_night'] = temp_celsius
+                        entry['temp_min'] = temp_celsius
                 
                 # Extract wind data (use daytime values preferentially)
-                if period.get('isDaytime', True) or daily_data_map[date]['wind_speed'] is None:
+                if is_daytime or entry['wind_speed'] is None:
                     wind_speed_str = period.get('windSpeed', '0 mph')
-                    if wind_speed_str:
-                        try:
-                            import re
-                            wind_match = re.search(r'(\d+(?:\.\d+)?)', wind_speed_str)
-                            if wind_match:
-                                wind_mph = float(wind_match.group(1))
-                                daily_data_map[date]['wind_speed'] = wind_mph * 0.44704  # Convert to m/s
-                        except Exception:
-                            pass
+                    wind_mph = _parse_wind_mph(wind_speed_str)
+                    if wind_mph is not None:
+                        entry['wind_speed'] = wind_mph * 0.44704  # Convert to m/s
                     
                     wind_direction = period.get('windDirection', 'N')
                     if wind_direction:
-                        direction_map = {
-                            'N': 0, 'NNE': 22, 'NE': 45, 'ENE': 67,
-                            'E': 90, 'ESE': 112, 'SE': 135, 'SSE': 157,
-                            'S': 180, 'SSW': 202, 'SW': 225, 'WSW': 247,
-                            'W': 270, 'WNW': 292, 'NW': 315, 'NNW': 337
-                        }
-                        daily_data_map[date]['wind_deg'] = direction_map.get(wind_direction, 0)
+                        entry['wind_deg'] = _WIND_DIR_MAP.get(wind_direction, 0)
                 
                 # Extract description and icon (use daytime values preferentially)
-                if period.get('isDaytime', True) or daily_data_map[date]['description'] is None:
+                if is_daytime or entry['description'] is None:
                     description = period.get('shortForecast', 'Unknown')
-                    daily_data_map[date]['description'] = description
-                    daily_data_map[date]['icon'] = _map_nws_icon_to_weather_icon(description)
+                    entry['description'] = description
+                    entry['icon'] = _map_nws_icon_to_weather_icon(description)
                 
                 # Extract probability of precipitation (use maximum)
                 pop = period.get('probabilityOfPrecipitation', {})
                 if isinstance(pop, dict):
                     pop = pop.get('value', 0)
-                if pop is not None:
+                # Missing and 0% values can't raise the day's maximum
+                if pop:
                     try:
                         pop_decimal = float(pop) / 100.0
-                        daily_data_map[date]['pop'] = max(daily_data_map[date]['pop'], pop_decimal)
+                        if pop_decimal > entry['pop']:
+                            entry['pop'] = pop_decimal
                     except (ValueError, TypeError):
                         pass
                 
-            except Exception as e:
-                logger.warning(f"Failed to process daily period: {e}")
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                # Malformed period data; programming errors propagate
+                logger.warning("Failed to process daily period: %s", e)
                 continue
         
-        # Convert to list and limit to 7 days
-        sorted_dates = sorted(daily_data_map.keys())[:7]
-        for date in sorted_dates:
-            daily_data = daily_data_map[date]
-            
+        # Convert to list and limit to 7 days, in date order
+        if dates_in_order:
+            daily_entries = daily_data_map.values()
+        else:
+            daily_entries = [daily_data_map[date] for date in sorted(daily_data_map)]
+        
+        for daily_data in itertools.islice(daily_entries, 7):
             # Ensure we have min/max temperatures
             if daily_data['temp_min'] is None and daily_data['temp_max'] is not None:
                 daily_data['temp_min'] = daily_data['temp_max'] - 5  # Estimate
@@ -867,9 +1123,9 @@ def transform_nws_daily_forecast(nws_data: Dict[str, Any]) -> List[Dict[str, Any
             
             transformed_data.append(daily_data)
         
-        logger.info(f"Successfully transformed {len(transformed_data)} daily forecast periods")
+        logger.info("Successfully transformed %d daily forecast periods", len(transformed_data))
         return transformed_data
         
     except Exception as e:
-        logger.error(f"Failed to transform NWS daily forecast data: {e}")
+        logger.error("Failed to transform NWS daily forecast data: %s", e)
         return [] 
\ No newline at end of file
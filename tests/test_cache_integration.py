@@ -24,6 +24,7 @@ def test_cache_integration():
         mock_config.boston_lat = 42.3601
         mock_config.boston_lon = -71.0589
         mock_config.duckdb_path = "/tmp/test.db"
+        mock_config.nws_cache_path = None
         mock_nws_config.validate_coordinates.return_value = True
         
         # Mock database manager context
@@ -35,8 +36,8 @@ def test_cache_integration():
         mock_connection = MagicMock()
         mock_duckdb.return_value = mock_connection
         
-        # Import after mocking
-        from main import WeatherExtractor
+        # Import after mocking, from the module the patches apply to
+        from extractor.main import WeatherExtractor
         from nws_cache import NWSCache
         
         # Create extractor
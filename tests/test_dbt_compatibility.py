@@ -17,7 +17,7 @@ import logging
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
 
 from extractor.config import config
-from extractor.utils import DatabaseManager
+from extractor.utils import DatabaseManager, connect_database
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,15 +30,32 @@ class DBTCompatibilityTest:
     def __init__(self):
         self.temp_db_path = None
         self.dbt_dir = os.path.join(os.path.dirname(__file__), 'dbt')
+        # Connection shared by the tests that run before dbt; dbt needs the
+        # database file to itself, so it is closed before dbt runs
+        self.connection = None
         
+    def database(self) -> DatabaseManager:
+        """DatabaseManager on the shared connection, or its own one once that is closed."""
+        return DatabaseManager(self.temp_db_path, self.connection)
+    
+    def close_database(self):
+        """Close the shared connection, releasing the database file lock."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
     def setup_test_database_with_sample_data(self):
         """Set up test database with sample NWS-style data."""
         temp_dir = tempfile.mkdtemp()
         self.temp_db_path = os.path.join(temp_dir, 'test_weather.db')
+        self.connection = connect_database(self.temp_db_path)
         
-        with DatabaseManager(self.temp_db_path) as db:
+        with self.database() as db:
             db.initialize_database()
             
+            # Load all sample data in one transaction, as the extractor does
+            db.begin()
+            
             # Insert sample current weather data
             current_data = {
                 'timestamp': datetime.now(timezone.utc),
@@ -90,11 +107,13 @@ class DBTCompatibilityTest:
                     'pop': i * 0.1
                 })
             db.insert_daily_weather(daily_data)
+            db.commit()
         
         logger.info(f"Test database with sample data created: {self.temp_db_path}")
     
     def cleanup_test_database(self):
         """Clean up test database."""
+        self.close_database()
         if self.temp_db_path and os.path.exists(self.temp_db_path):
             os.remove(self.temp_db_path)
             logger.info("Test database cleaned up")
@@ -118,94 +137,36 @@ weather_pipeline:
         logger.info(f"Test dbt profile created: {profiles_path}")
         return profiles_path
     
-    def test_dbt_models_compile(self) -> bool:
-        """Test that dbt models compile successfully."""
-        logger.info("Testing dbt model compilation...")
-        
-        try:
-            result = subprocess.run(
-                ['dbt', 'compile', '--profiles-dir', '.'],
-                cwd=self.dbt_dir,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            if result.returncode == 0:
-                logger.info("✓ dbt models compile successfully")
-                return True
-            else:
-                logger.error(f"✗ dbt compilation failed: {result.stderr}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            logger.error("✗ dbt compilation timed out")
-            return False
-        except FileNotFoundError:
-            logger.warning("dbt command not found - skipping compilation test")
-            return True  # Don't fail if dbt is not installed
-        except Exception as e:
-            logger.error(f"✗ dbt compilation test failed: {e}")
-            return False
-    
-    def test_dbt_models_run(self) -> bool:
-        """Test that dbt models run successfully."""
-        logger.info("Testing dbt model execution...")
+    def test_dbt_build(self) -> bool:
+        """Test that dbt models compile, run and pass their tests."""
+        logger.info("Testing dbt build (compile, run and test)...")
         
         try:
+            # One dbt invocation instead of compile/run/test, so dbt's startup
+            # and project parsing are only paid once
             result = subprocess.run(
-                ['dbt', 'run', '--profiles-dir', '.'],
+                ['dbt', 'build', '--profiles-dir', '.'],
                 cwd=self.dbt_dir,
                 capture_output=True,
                 text=True,
-                timeout=180
+                timeout=420
             )
             
             if result.returncode == 0:
-                logger.info("✓ dbt models run successfully")
+                logger.info("✓ dbt models build and tests pass")
                 return True
             else:
-                logger.error(f"✗ dbt run failed: {result.stderr}")
+                logger.error(f"✗ dbt build failed: {result.stderr or result.stdout}")
                 return False
                 
         except subprocess.TimeoutExpired:
-            logger.error("✗ dbt run timed out")
+            logger.error("✗ dbt build timed out")
             return False
         except FileNotFoundError:
-            logger.warning("dbt command not found - skipping run test")
+            logger.warning("dbt command not found - skipping build test")
             return True  # Don't fail if dbt is not installed
         except Exception as e:
-            logger.error(f"✗ dbt run test failed: {e}")
-            return False
-    
-    def test_dbt_tests_pass(self) -> bool:
-        """Test that dbt tests pass."""
-        logger.info("Testing dbt tests...")
-        
-        try:
-            result = subprocess.run(
-                ['dbt', 'test', '--profiles-dir', '.'],
-                cwd=self.dbt_dir,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            if result.returncode == 0:
-                logger.info("✓ dbt tests pass")
-                return True
-            else:
-                logger.error(f"✗ dbt tests failed: {result.stderr}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            logger.error("✗ dbt tests timed out")
-            return False
-        except FileNotFoundError:
-            logger.warning("dbt command not found - skipping tests")
-            return True  # Don't fail if dbt is not installed
-        except Exception as e:
-            logger.error(f"✗ dbt tests failed: {e}")
+            logger.error(f"✗ dbt build test failed: {e}")
             return False
     
     def test_staging_models_output(self) -> bool:
@@ -213,7 +174,7 @@ weather_pipeline:
         logger.info("Testing staging model outputs...")
         
         try:
-            with DatabaseManager(self.temp_db_path) as db:
+            with self.database() as db:
                 # Test that staging models create the expected views/tables
                 # Note: This assumes dbt has run successfully
                 
@@ -262,86 +223,77 @@ weather_pipeline:
         logger.info("Testing manual SQL compatibility...")
         
         try:
-            with DatabaseManager(self.temp_db_path) as db:
-                # Test queries similar to what's in the staging models
-                
-                # Test current weather staging logic
-                current_query = """
-                SELECT 
-                    timestamp,
-                    temp,
-                    feels_like,
-                    humidity,
-                    pressure,
-                    wind_speed,
-                    wind_deg,
-                    description,
-                    icon,
-                    CASE 
-                        WHEN temp < 0 THEN 'freezing'
-                        WHEN temp < 10 THEN 'cold'
-                        WHEN temp < 20 THEN 'cool'
-                        WHEN temp < 30 THEN 'warm'
-                        ELSE 'hot'
-                    END as temp_category
-                FROM current_weather
-                WHERE timestamp IS NOT NULL
-                """
-                
-                current_result = db.execute_query(current_query)
-                if current_result:
-                    logger.info(f"✓ Current weather staging query works ({len(current_result)} records)")
-                else:
-                    logger.error("✗ Current weather staging query failed")
-                    return False
-                
-                # Test hourly weather staging logic
-                hourly_query = """
+            with self.database() as db:
+                # Queries similar to what's in the staging models, run as one
+                # statement: each CTE is bound and type-checked against the
+                # raw tables, and a single row of counts comes back
+                staging_query = """
+                WITH current_staging AS (
+                    SELECT 
+                        timestamp,
+                        temp,
+                        feels_like,
+                        humidity,
+                        pressure,
+                        wind_speed,
+                        wind_deg,
+                        description,
+                        icon,
+                        CASE 
+                            WHEN temp < 0 THEN 'freezing'
+                            WHEN temp < 10 THEN 'cold'
+                            WHEN temp < 20 THEN 'cool'
+                            WHEN temp < 30 THEN 'warm'
+                            ELSE 'hot'
+                        END as temp_category
+                    FROM current_weather
+                    WHERE timestamp IS NOT NULL
+                ),
+                hourly_staging AS (
+                    SELECT 
+                        timestamp,
+                        temp,
+                        humidity,
+                        pop,
+                        CASE 
+                            WHEN pop < 0.1 THEN 'low'
+                            WHEN pop < 0.5 THEN 'medium'
+                            ELSE 'high'
+                        END as precipitation_probability
+                    FROM hourly_weather
+                    WHERE timestamp IS NOT NULL
+                    LIMIT 10
+                ),
+                daily_staging AS (
+                    SELECT 
+                        date,
+                        temp_min,
+                        temp_max,
+                        (temp_max + temp_min) / 2 as temp_avg,
+                        temp_max - temp_min as temp_range,
+                        CASE 
+                            WHEN pop < 0.1 THEN 'low'
+                            WHEN pop < 0.5 THEN 'medium'
+                            ELSE 'high'
+                        END as precipitation_probability
+                    FROM daily_weather
+                    WHERE date IS NOT NULL
+                )
                 SELECT 
-                    timestamp,
-                    temp,
-                    humidity,
-                    pop,
-                    CASE 
-                        WHEN pop < 0.1 THEN 'low'
-                        WHEN pop < 0.5 THEN 'medium'
-                        ELSE 'high'
-                    END as precipitation_probability
-                FROM hourly_weather
-                WHERE timestamp IS NOT NULL
-                LIMIT 10
+                    (SELECT COUNT(*) FROM current_staging) as current_records,
+                    (SELECT COUNT(*) FROM hourly_staging) as hourly_records,
+                    (SELECT COUNT(*) FROM daily_staging) as daily_records
                 """
                 
-                hourly_result = db.execute_query(hourly_query)
-                if hourly_result:
-                    logger.info(f"✓ Hourly weather staging query works ({len(hourly_result)} records)")
-                else:
-                    logger.error("✗ Hourly weather staging query failed")
-                    return False
-                
-                # Test daily weather staging logic
-                daily_query = """
-                SELECT 
-                    date,
-                    temp_min,
-                    temp_max,
-                    (temp_max + temp_min) / 2 as temp_avg,
-                    temp_max - temp_min as temp_range,
-                    CASE 
-                        WHEN pop < 0.1 THEN 'low'
-                        WHEN pop < 0.5 THEN 'medium'
-                        ELSE 'high'
-                    END as precipitation_probability
-                FROM daily_weather
-                WHERE date IS NOT NULL
-                """
-                
-                daily_result = db.execute_query(daily_query)
-                if daily_result:
-                    logger.info(f"✓ Daily weather staging query works ({len(daily_result)} records)")
-                else:
-                    logger.error("✗ Daily weather staging query failed")
-                    return False
+                counts = db.execute_query(staging_query)[0]
+                for name, key in (("Current", "current_records"),
+                                  ("Hourly", "hourly_records"),
+                                  ("Daily", "daily_records")):
+                    if counts[key]:
+                        logger.info(f"✓ {name} weather staging query works ({counts[key]} records)")
+                    else:
+                        logger.error(f"✗ {name} weather staging query failed")
+                        return False
                 
                 logger.info("✓ Manual SQL compatibility test passed")
                 return True
@@ -368,15 +320,12 @@ weather_pipeline:
             results['manual_sql_compatibility'] = self.test_manual_sql_compatibility()
             
             if os.path.exists(self.dbt_dir):
-                results['dbt_compile'] = self.test_dbt_models_compile()
-                results['dbt_run'] = self.test_dbt_models_run()
-                results['dbt_tests'] = self.test_dbt_tests_pass()
+                self.close_database()
+                results['dbt_build'] = self.test_dbt_build()
                 results['staging_outputs'] = self.test_staging_models_output()
             else:
                 logger.warning("dbt directory not found - skipping dbt-specific tests")
-                results['dbt_compile'] = True
-                results['dbt_run'] = True
-                results['dbt_tests'] = True
+                results['dbt_build'] = True
                 results['staging_outputs'] = True
             
             return results
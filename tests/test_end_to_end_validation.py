@@ -6,6 +6,7 @@ This script performs comprehensive testing of the complete data extraction workf
 validates data quality, and ensures downstream compatibility.
 """
 
+import dataclasses
 import os
 import sys
 import time
@@ -13,6 +14,7 @@ import json
 import sqlite3
 import tempfile
 import subprocess
+from unittest.mock import patch
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 import logging
@@ -52,7 +54,7 @@ class EndToEndValidator:
             'performance': False
         }
         self.temp_db_path = None
-        self.original_db_path = config.duckdb_path
+        self.config_patch = None
         
     def setup_test_environment(self):
         """Set up temporary test environment."""
@@ -62,8 +64,12 @@ class EndToEndValidator:
         temp_dir = tempfile.mkdtemp()
         self.temp_db_path = os.path.join(temp_dir, 'test_weather.db')
         
-        # Override config for testing
-        config.duckdb_path = self.temp_db_path
+        # Point the extractor at the test database; the config is frozen, so
+        # patch in a modified copy
+        self.config_patch = patch(
+            'extractor.main.config', dataclasses.replace(config, duckdb_path=self.temp_db_path)
+        )
+        self.config_patch.start()
         
         # Create the temporary database directory
         os.makedirs(os.path.dirname(self.temp_db_path), exist_ok=True)
@@ -75,7 +81,9 @@ class EndToEndValidator:
         logger.info("Cleaning up test environment...")
         
         # Restore original config
-        config.duckdb_path = self.original_db_path
+        if self.config_patch:
+            self.config_patch.stop()
+            self.config_patch = None
         
         # Remove temporary database
         if self.temp_db_path and os.path.exists(self.temp_db_path):
@@ -7,6 +7,8 @@ import os
 import time
 from unittest.mock import patch, MagicMock
 
+import orjson
+
 # Add extractor directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
 
@@ -26,15 +28,17 @@ def test_cache_with_nws_client():
         }
     }
     
-    # Create client with short cache TTL for testing
-    client = NWSAPIClient(cache_ttl=2)
+    # Create client with short cache TTL and a fake clock for testing
+    clock = [time.time()]
+    client = NWSAPIClient(cache_ttl=2, time_fn=lambda: clock[0])
     
     # Test coordinates
     lat, lon = 42.3601, -71.0589
     
     # Mock the actual HTTP request
-    with patch.object(client, 'make_request') as mock_request:
-        mock_request.return_value = mock_points_response
+    response = MagicMock(ok=True, status_code=200, headers={},
+                         content=orjson.dumps(mock_points_response))
+    with patch.object(client.session, 'get', return_value=response) as mock_request:
         
         # First call should hit the API
         result1 = client._get_nws_metadata(lat, lon)
@@ -48,9 +52,8 @@ def test_cache_with_nws_client():
         
         print("✓ API client cache usage test passed")
         
-        # Wait for cache expiration
-        print("Waiting for cache expiration...")
-        time.sleep(3)
+        # Move the cache clock past the TTL instead of sleeping
+        clock[0] += 3
         
         # Third call should hit API again after expiration
         result3 = client._get_nws_metadata(lat, lon)
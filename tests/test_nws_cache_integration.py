@@ -109,6 +109,173 @@ def test_cache_cleanup():
     
     print("Cache cleanup tests passed!")
 
+def test_cache_key_rounding():
+    """Test that float jitter in coordinates still hits the cache."""
+    print("\nTesting cache key rounding...")
+    
+    cache = NWSCache(cache_ttl=3600)
+    test_data = {"properties": {"test": "data"}}
+    cache.cache_points_data(42.3601000001, -71.0589, test_data)
+    
+    assert cache.get_cached_points(42.3601, -71.0589000002) == test_data
+    assert cache.get_cached_points(42.3612, -71.0561) == test_data, "Same ~1 km cell should hit"
+    assert cache.get_cached_points(42.3701, -71.0589) is None, "Different grid location should miss"
+    print("✓ Cache key rounding test passed")
+
+def test_cache_persistence():
+    """Test that cached points data survives a new cache instance."""
+    print("\nTesting cache persistence...")
+    
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "nws_cache.json")
+        test_data = {"properties": {"forecast": "https://api.weather.gov/gridpoints/BOX/71,90/forecast"}}
+        
+        cache = NWSCache(cache_ttl=3600, cache_path=cache_path)
+        cache.cache_points_data(42.3601, -71.0589, test_data)
+        assert os.path.exists(cache_path), "Cache file should be written"
+        
+        # A fresh instance (e.g. after a restart) should serve the entry from disk
+        restarted = NWSCache(cache_ttl=3600, cache_path=cache_path)
+        result = restarted.get_cached_points(42.3601, -71.0589)
+        assert result == test_data, "Persisted entry should be loaded on startup"
+        print("✓ Cache reload test passed")
+        
+        restarted.clear_cache()
+        assert NWSCache(cache_ttl=3600, cache_path=cache_path).get_cache_stats()["total_entries"] == 0
+        print("✓ Cache clear persistence test passed")
+    
+    print("Cache persistence tests passed!")
+
+def test_cache_sweep():
+    """Test that reads evict expired entries for other coordinates."""
+    print("\nTesting cache eviction on read...")
+    
+    clock = [time.time()]
+    cache = NWSCache(cache_ttl=3600, time_fn=lambda: clock[0])
+    test_data = {"properties": {"test": "data"}}
+    
+    # NYC is cached first, so it expires first
+    cache.cache_points_data(40.7128, -74.0060, test_data)
+    clock[0] += 1800
+    cache.cache_points_data(42.3601, -71.0589, test_data)
+    
+    # Past the NYC entry's TTL but not Boston's
+    clock[0] += 2400
+    assert cache.get_cached_points(42.3601, -71.0589) == test_data
+    assert cache.get_cache_stats()["total_entries"] == 1, "Expired entry should be evicted on read"
+    print("✓ Cache eviction on read test passed")
+    
+    # Refreshing an entry keeps it alive past its original expiry
+    cache.cache_points_data(42.3601, -71.0589, test_data)
+    clock[0] += 1800
+    assert cache.cleanup_expired() == 0, "Refreshed entry should not be evicted"
+    assert cache.get_cached_points(42.3601, -71.0589) == test_data
+    print("✓ Refreshed entry eviction test passed")
+    
+    print("Cache eviction tests passed!")
+
+def test_station_cache():
+    """Test caching of the resolved observation station."""
+    print("\nTesting station cache...")
+    
+    clock = [1_000_000.0]
+    cache = NWSCache(cache_ttl=3600, station_ttl=86400, time_fn=lambda: clock[0])
+    lat, lon = 42.3601, -71.0589
+    
+    assert cache.get_cached_station(lat, lon) is None, "Should miss before caching"
+    
+    cache.cache_station(lat, lon, "KBOS")
+    assert cache.get_cached_station(lat, lon) == "KBOS"
+    print("✓ Station cache hit test passed")
+    
+    # Entries older than the station TTL are dropped
+    clock[0] += 86401
+    assert cache.get_cached_station(lat, lon) is None, "Should miss after station TTL"
+    assert cache.station_cache == {}, "Expired entry should be dropped"
+    print("✓ Station cache expiration test passed")
+    
+    cache.cache_station(lat, lon, "KBOS")
+    cache.invalidate_station(lat, lon)
+    assert cache.get_cached_station(lat, lon) is None, "Should miss after invalidation"
+    print("✓ Station cache invalidation test passed")
+    
+    print("Station cache tests passed!")
+
+def test_negative_cache():
+    """Test caching of locations outside NWS coverage."""
+    print("\nTesting negative cache...")
+    
+    clock = [1_000_000.0]
+    cache = NWSCache(cache_ttl=3600, negative_ttl=600, time_fn=lambda: clock[0])
+    lat, lon = 42.3601, -71.0589
+    
+    assert not cache.is_negative(lat, lon), "Should miss before caching"
+    
+    cache.cache_negative_points(lat, lon)
+    assert cache.is_negative(lat, lon)
+    assert cache.is_negative(42.3612, -71.0561), "Same ~1 km cell should hit"
+    assert not cache.is_negative(40.7128, -74.0060), "Other locations should miss"
+    assert cache.get_cached_points(lat, lon) is None, "Negative entries are not points data"
+    print("✓ Negative cache hit test passed")
+    
+    clock[0] += 601
+    assert not cache.is_negative(lat, lon), "Should miss after negative TTL"
+    assert cache.negative_cache == {}, "Expired entry should be dropped"
+    print("✓ Negative cache expiration test passed")
+    
+    cache.cache_negative_points(lat, lon)
+    cache.clear_cache()
+    assert not cache.is_negative(lat, lon), "Should miss after clearing"
+    print("✓ Negative cache clear test passed")
+    
+    print("Negative cache tests passed!")
+
+def test_concurrent_access():
+    """Test that concurrent readers and writers don't corrupt the cache."""
+    print("\nTesting concurrent cache access...")
+    
+    import tempfile
+    import threading
+    
+    errors = []
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = NWSCache(cache_ttl=3600, cache_path=os.path.join(tmp_dir, "nws_cache.json"),
+                         max_entries=16)
+        test_data = {"properties": {"test": "data"}}
+        
+        def worker(offset):
+            try:
+                for i in range(200):
+                    lat, lon = 40.0 + ((offset * 7 + i) % 40) / 100, -71.0
+                    if cache.get_cached_points(lat, lon) is None:
+                        cache.cache_points_data(lat, lon, test_data, ttl=i % 5)
+                    cache.cache_station(lat, lon, "KBOS")
+                    cache.cache_negative_points(lat + 10, lon)
+            except Exception as e:
+                errors.append(e)
+        
+        # Switch threads often so the workers interleave inside cache methods
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        
+        assert not errors, f"Concurrent access raised: {errors[0]!r}"
+        assert len(cache.points_cache) <= 16, "Size bound should hold under concurrency"
+        live = {key for _, key in cache._expiry_heap}
+        assert set(cache.points_cache) <= live, "Every entry should have an expiry heap item"
+    
+    print("✓ Concurrent cache access test passed")
+
 def test_integration_with_weather_extractor():
     """Test cache integration with WeatherExtractor."""
     print("\nTesting cache integration with WeatherExtractor...")
@@ -122,6 +289,7 @@ def test_integration_with_weather_extractor():
         mock_config.boston_lat = 42.3601
         mock_config.boston_lon = -71.0589
         mock_config.duckdb_path = "test.db"
+        mock_config.nws_cache_path = None
         mock_nws_config.validate_coordinates.return_value = True
         
         # Import after mocking
@@ -147,6 +315,12 @@ def main():
         test_nws_cache_basic_functionality()
         test_cache_stats()
         test_cache_cleanup()
+        test_cache_key_rounding()
+        test_cache_persistence()
+        test_cache_sweep()
+        test_station_cache()
+        test_negative_cache()
+        test_concurrent_access()
         test_integration_with_weather_extractor()
         
         print("\n🎉 All NWS cache integration tests passed!")
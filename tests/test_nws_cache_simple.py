@@ -4,7 +4,6 @@ Simple test script to verify NWS cache functionality.
 """
 import sys
 import os
-import time
 
 # Add extractor directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
@@ -15,8 +14,11 @@ def test_cache_functionality():
     """Test the NWS cache functionality."""
     print("Testing NWS cache functionality...")
     
+    # Fake clock, advanced by hand instead of sleeping
+    clock = [1_000_000.0]
+    
     # Create cache with 2 second TTL for testing
-    cache = NWSCache(cache_ttl=2)
+    cache = NWSCache(cache_ttl=2, time_fn=lambda: clock[0])
     
     # Test coordinates (Boston)
     lat, lon = 42.3601, -71.0589
@@ -46,6 +48,10 @@ def test_cache_functionality():
     assert "_cached_at" not in result, "Should not return internal timestamp"
     print("✓ Cache hit test passed")
     
+    # Nearby coordinates in the same ~1 km cell share the entry
+    assert cache.get_cached_points(42.3612, -71.0561) is result, "Nearby coordinates should hit"
+    print("✓ Nearby coordinates cache hit test passed")
+    
     # Test 4: Cache statistics
     stats = cache.get_cache_stats()
     assert stats["total_entries"] == 1
@@ -54,22 +60,21 @@ def test_cache_functionality():
     print("✓ Cache statistics test passed")
     
     # Test 5: Cache expiration
-    print("Waiting for cache expiration...")
-    time.sleep(3)
+    clock[0] += 3
     result = cache.get_cached_points(lat, lon)
     assert result is None, "Should return None after expiration"
     print("✓ Cache expiration test passed")
     
     # Test 6: Cache cleanup
     # Create fresh cache for cleanup test
-    cache = NWSCache(cache_ttl=1)  # 1 second TTL
+    cache = NWSCache(cache_ttl=1, time_fn=lambda: clock[0])  # 1 second TTL
     
     # Add multiple entries
     cache.cache_points_data(42.3601, -71.0589, test_data)  # Boston
     cache.cache_points_data(40.7128, -74.0060, test_data)  # NYC
     
-    # Wait for expiration
-    time.sleep(2)
+    # Let them expire
+    clock[0] += 2
     
     # Add fresh entry
     cache.cache_points_data(34.0522, -118.2437, test_data)  # LA
@@ -91,5 +96,28 @@ def test_cache_functionality():
     
     print("\n🎉 All cache functionality tests passed!")
 
+def test_cache_size_bound():
+    """Test that the cache evicts least recently used entries past max_entries."""
+    print("\nTesting cache size bound...")
+    
+    cache = NWSCache(cache_ttl=3600, max_entries=2)
+    test_data = {"properties": {"test": "data"}}
+    
+    cache.cache_points_data(42.3601, -71.0589, test_data)   # Boston
+    cache.cache_points_data(40.7128, -74.0060, test_data)   # NYC
+    
+    # Reading Boston makes NYC the least recently used entry
+    assert cache.get_cached_points(42.3601, -71.0589) is not None
+    
+    cache.cache_points_data(34.0522, -118.2437, test_data)  # LA
+    
+    stats = cache.get_cache_stats()
+    assert stats["total_entries"] == 2, "Cache should stay at max_entries"
+    assert cache.get_cached_points(40.7128, -74.0060) is None, "Least recently used entry should be evicted"
+    assert cache.get_cached_points(42.3601, -71.0589) is not None, "Recently read entry should be kept"
+    assert cache.get_cached_points(34.0522, -118.2437) is not None, "Newest entry should be kept"
+    print("✓ Cache size bound test passed")
+
 if __name__ == "__main__":
-    test_cache_functionality()
\ No newline at end of file
+    test_cache_functionality()
+    test_cache_size_bound()
\ No newline at end of file
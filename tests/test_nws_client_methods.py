@@ -4,6 +4,10 @@ Test script for NWS API client methods.
 """
 import sys
 import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import orjson
 
 # Add the extractor directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
@@ -13,6 +17,47 @@ import nws_client
 
 NWSAPIClient = nws_client.NWSAPIClient
 
+# Mock responses for a location whose metadata points at the URLs below
+POINTS_URL = NWSConfig.get_points_url(42.3601, -71.0589)
+MOCK_ROUTES = {
+    POINTS_URL: {
+        "properties": {
+            "forecast": "https://api.weather.gov/gridpoints/BOX/71,90/forecast",
+            "forecastHourly": "https://api.weather.gov/gridpoints/BOX/71,90/forecast/hourly",
+            "observationStations": "https://api.weather.gov/gridpoints/BOX/71,90/stations"
+        }
+    },
+    "https://api.weather.gov/gridpoints/BOX/71,90/forecast": {"properties": {"periods": []}},
+    "https://api.weather.gov/gridpoints/BOX/71,90/forecast/hourly": {"properties": {"periods": []}},
+    "https://api.weather.gov/gridpoints/BOX/71,90/stations": {
+        "features": [{"properties": {"stationIdentifier": "KBOS"}}]
+    },
+    "https://api.weather.gov/stations/KBOS/observations/latest": {"properties": {}},
+}
+
+
+def mock_response(data=None, status_code=200, headers=None):
+    """Build a requests.Response stand-in."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.ok = status_code < 400
+    response.content = orjson.dumps(data)
+    response.text = ""
+    response.headers = headers or {}
+    return response
+
+
+def mock_session(client, routes, headers=None):
+    """Serve the client's GETs from routes (url -> data), 404 otherwise, and return the mock."""
+    def get_url(url, timeout=None):
+        if url not in routes:
+            return mock_response(status_code=404)
+        return mock_response(routes[url], headers=(headers or {}).get(url))
+    
+    get = MagicMock(side_effect=get_url)
+    client.session.get = get
+    return get
+
 
 def test_nws_client_methods():
     """Test NWS API client methods."""
@@ -84,6 +129,257 @@ def test_error_handling():
         client.close()
 
 
+def test_points_ttl():
+    """Test that only points responses record a TTL, defaulting to cache_ttl."""
+    print("Testing points metadata TTL...")
+    
+    lat, lon = 42.3601, -71.0589
+    key = nws_client._grid_key(lat, lon)
+    now = 1_000_000.0
+    
+    # A points response's max-age sets the entry's TTL
+    with NWSAPIClient(cache_ttl=120, time_fn=lambda: now) as client:
+        mock_session(client, MOCK_ROUTES, headers={POINTS_URL: {"Cache-Control": "public, max-age=600"}})
+        client.fetch_all(lat, lon)
+        expires_at, _ = client.cache.points_cache[key]
+        assert expires_at == now + 600, "max-age should set the points TTL"
+    
+    # Without max-age the entry falls back to the client's cache_ttl
+    with NWSAPIClient(cache_ttl=120, time_fn=lambda: now) as client:
+        mock_session(client, MOCK_ROUTES)
+        client.fetch_all(lat, lon)
+        expires_at, _ = client.cache.points_cache[key]
+        assert expires_at == now + 120, "Missing max-age should fall back to cache_ttl"
+    
+    # Callers sharing one coalesced points request all cache its max-age
+    in_flight = threading.Event()
+    follower_waiting = threading.Event()
+    release = threading.Event()
+    
+    class TrackingFuture(nws_client.Future):
+        def result(self, timeout=None):
+            follower_waiting.set()
+            return super().result(timeout)
+    
+    def slow_get(url, timeout=None):
+        in_flight.set()
+        release.wait(5)
+        return mock_response(MOCK_ROUTES[url], headers={"Cache-Control": "max-age=600"})
+    
+    with NWSAPIClient(cache_ttl=120, time_fn=lambda: now) as client, \
+            patch.object(nws_client, 'Future', TrackingFuture):
+        client.session.get = MagicMock(side_effect=slow_get)
+        leader = threading.Thread(target=client._get_nws_metadata, args=(lat, lon))
+        leader.start()
+        assert in_flight.wait(5)
+        follower = threading.Thread(target=client._get_nws_metadata, args=(lat, lon))
+        follower.start()
+        assert follower_waiting.wait(5)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        
+        assert client.session.get.call_count == 1
+        expires_at, _ = client.cache.points_cache[key]
+        assert expires_at == now + 600, "Every coalesced caller should cache the max-age"
+    
+    print("✓ Points metadata TTL test passed")
+
+
+def test_retry_delay():
+    """Test jittered backoff, Retry-After handling and the delay cap."""
+    print("Testing retry delays...")
+    
+    error = NWSServiceUnavailableError("NWS API rate limit exceeded")
+    
+    # Full jitter stays within the exponential window and under the cap
+    for attempt in range(10):
+        delay = nws_client._retry_delay(1.0, attempt, error)
+        assert 0 <= delay <= min(2 ** attempt, nws_client.MAX_RETRY_DELAY)
+    
+    # A server-requested wait is a floor for the jittered delay...
+    error.retry_after = 5.0
+    with patch.object(nws_client.random, 'uniform', return_value=0.5):
+        assert nws_client._retry_delay(1.0, 0, error) == 5.0
+    with patch.object(nws_client.random, 'uniform', return_value=7.0):
+        assert nws_client._retry_delay(1.0, 3, error) == 7.0
+    
+    # ...but never pushes past the cap
+    error.retry_after = 3600.0
+    assert nws_client._retry_delay(1.0, 0, error) == nws_client.MAX_RETRY_DELAY
+    print("✓ Retry delay computation test passed")
+    
+    # handle_nws_error reads Retry-After (seconds only) off the response
+    for header, expected in (("5", 5.0), ("Wed, 21 Oct 2015 07:28:00 GMT", None), (None, None)):
+        headers = {"Retry-After": header} if header is not None else {}
+        try:
+            nws_client.handle_nws_error(mock_response(status_code=429, headers=headers))
+            assert False, "Should have raised NWSServiceUnavailableError"
+        except NWSServiceUnavailableError as e:
+            assert e.retry_after == expected
+    
+    # The decorator sleeps for the server-requested delay before retrying
+    attempts = []
+    
+    @nws_client.retry_with_exponential_backoff(max_attempts=3, base_delay=0.01)
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            nws_client.handle_nws_error(mock_response(status_code=503, headers={"Retry-After": "5"}))
+        return "ok"
+    
+    with patch.object(nws_client.time, 'sleep') as sleep:
+        assert flaky() == "ok"
+    sleep.assert_called_once_with(5.0)
+    print("✓ Retry-After test passed")
+
+
+def test_fetch_all():
+    """Test that fetch_all shares one points lookup across its three fetches."""
+    print("Testing fetch_all...")
+    
+    lat, lon = 42.3601, -71.0589
+    
+    with NWSAPIClient() as client:
+        get = mock_session(client, MOCK_ROUTES)
+        results = client.fetch_all(lat, lon)
+        
+        assert set(results) == {'current', 'hourly', 'daily'}
+        assert results['current'] is not None
+        assert results['hourly'] == MOCK_ROUTES["https://api.weather.gov/gridpoints/BOX/71,90/forecast/hourly"]
+        assert results['daily'] == MOCK_ROUTES["https://api.weather.gov/gridpoints/BOX/71,90/forecast"]
+        
+        urls = [call.args[0] for call in get.call_args_list]
+        assert urls.count(POINTS_URL) == 1, "Points metadata should be fetched once"
+        
+        # A failing fetch fails the whole call
+        routes = dict(MOCK_ROUTES)
+        del routes["https://api.weather.gov/gridpoints/BOX/71,90/forecast"]
+        mock_session(client, routes)
+        try:
+            client.fetch_all(lat, lon)
+            assert False, "Should have raised NWSAPIError"
+        except NWSAPIError:
+            pass
+    
+    print("✓ fetch_all test passed")
+
+
+def test_request_coalescing():
+    """Test that concurrent requests for the same URL share one HTTP call."""
+    print("Testing request coalescing...")
+    
+    in_flight = threading.Event()
+    follower_waiting = threading.Event()
+    release = threading.Event()
+    
+    class TrackingFuture(nws_client.Future):
+        def result(self, timeout=None):
+            follower_waiting.set()
+            return super().result(timeout)
+    
+    def slow_get(url, timeout=None):
+        in_flight.set()
+        release.wait(5)
+        return mock_response(MOCK_ROUTES[url])
+    
+    with NWSAPIClient() as client, patch.object(nws_client, 'Future', TrackingFuture):
+        client.session.get = MagicMock(side_effect=slow_get)
+        results = []
+        
+        def request():
+            results.append(client.make_request(POINTS_URL))
+        
+        # The second caller arrives while the first is still waiting on the server
+        leader = threading.Thread(target=request)
+        leader.start()
+        assert in_flight.wait(5)
+        follower = threading.Thread(target=request)
+        follower.start()
+        assert follower_waiting.wait(5)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        
+        assert client.session.get.call_count == 1, "Concurrent identical requests should share one call"
+        assert len(results) == 2 and results[0] is results[1]
+        assert client._inflight == {}, "Finished requests should be removed"
+        
+        # Once the first request has finished, a new one goes to the server again
+        client.make_request(POINTS_URL)
+        assert client.session.get.call_count == 2
+    
+    print("✓ Request coalescing test passed")
+
+
+def test_validate_coordinates_batch():
+    """Test that batch coverage checks agree with validate_coordinates."""
+    print("Testing batch coordinate validation...")
+    
+    points = [
+        (42.3601, -71.0589),   # Boston
+        (61.2181, -149.9003),  # Anchorage
+        (21.3069, -157.8583),  # Honolulu
+        (18.4655, -66.1057),   # San Juan
+        (51.5074, -0.1278),    # London, outside the envelope
+        (35.0, -140.0),        # Pacific, inside the envelope but no area
+        (24.5, -125.0),        # Continental US corner, inclusive
+    ]
+    lats, lons = zip(*points)
+    
+    with NWSAPIClient() as client:
+        mask = client.validate_coordinates_batch(lats, lons)
+        assert mask.tolist() == [NWSConfig.validate_coordinates(lat, lon) for lat, lon in points]
+        assert mask.tolist() == [True, True, True, True, False, False, True]
+        assert client.validate_coordinates_batch([], []).tolist() == []
+    
+    print("✓ Batch coordinate validation test passed")
+
+
+def test_negative_points_cache():
+    """Test that a 404 points response is not refetched within negative_ttl."""
+    print("Testing negative points cache...")
+    
+    lat, lon = 42.3601, -71.0589
+    clock = [1_000_000.0]
+    
+    with NWSAPIClient(time_fn=lambda: clock[0]) as client:
+        # The points endpoint reports the location as outside coverage
+        get = mock_session(client, {})
+        for _ in range(3):
+            try:
+                client._get_nws_metadata(lat, lon)
+                assert False, "Should have raised NWSGeographicError"
+            except NWSGeographicError:
+                pass
+        assert get.call_count == 1, "Negative result should be cached"
+        
+        # Nearby coordinates in the same grid cell share the negative entry
+        try:
+            client._get_nws_metadata(42.3612, -71.0561)
+            assert False, "Should have raised NWSGeographicError"
+        except NWSGeographicError:
+            pass
+        assert get.call_count == 1
+        
+        # After negative_ttl the location is asked about again
+        clock[0] += client.cache.negative_ttl + 1
+        mock_session(client, MOCK_ROUTES)
+        assert client._get_nws_metadata(lat, lon) == MOCK_ROUTES[POINTS_URL]
+    
+    print("✓ Negative points cache test passed")
+
+
+OFFLINE_TESTS = (
+    test_points_ttl,
+    test_retry_delay,
+    test_fetch_all,
+    test_request_coalescing,
+    test_validate_coordinates_batch,
+    test_negative_points_cache,
+)
+
+
 def main():
     """Run all tests."""
     print("Running NWS API Client Methods Tests\n")
@@ -92,6 +388,10 @@ def main():
         success1 = test_nws_client_methods()
         success2 = test_error_handling()
         
+        # Offline tests against a mocked session; these raise on failure
+        for test in OFFLINE_TESTS:
+            test()
+        
         if success1 and success2:
             print("\n🎉 All NWS API client methods tests passed!")
             return True
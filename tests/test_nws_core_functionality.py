@@ -9,9 +9,11 @@ without relying on the full WeatherExtractor class.
 import os
 import sys
 import tempfile
-from datetime import datetime, timezone
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 # Add extractor directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
@@ -19,12 +21,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'extractor'))
 from extractor.config import config, NWSConfig
 from extractor.utils import (
     DatabaseManager,
+    connect_database,
     transform_nws_current_weather,
     transform_nws_hourly_forecast,
     transform_nws_daily_forecast,
     validate_nws_response
 )
-from extractor.nws_cache import NWSCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,19 +38,30 @@ class NWSCoreFunctionalityTest:
     
     def __init__(self):
         self.temp_db_path = None
+        # One keep-alive session for all NWS requests, sized for the three
+        # concurrent forecast/observation fetches
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        # DuckDB connection shared by every test in the run
+        self.connection = None
         
     def setup_test_database(self):
         """Set up temporary test database."""
         temp_dir = tempfile.mkdtemp()
         self.temp_db_path = os.path.join(temp_dir, 'test_weather.db')
+        self.connection = connect_database(self.temp_db_path)
         
-        with DatabaseManager(self.temp_db_path) as db:
+        with DatabaseManager(self.temp_db_path, self.connection) as db:
             db.initialize_database()
         
         logger.info(f"Test database created: {self.temp_db_path}")
     
     def cleanup_test_database(self):
         """Clean up test database."""
+        self.session.close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
         if self.temp_db_path and os.path.exists(self.temp_db_path):
             os.remove(self.temp_db_path)
             logger.info("Test database cleaned up")
@@ -62,12 +75,12 @@ class NWSCoreFunctionalityTest:
             points_url = NWSConfig.get_points_url(config.boston_lat, config.boston_lon)
             headers = NWSConfig.get_headers()
             
-            response = requests.get(points_url, headers=headers, timeout=30)
+            response = self.session.get(points_url, headers=headers, timeout=30)
             if response.status_code != 200:
                 logger.error(f"Failed to get NWS points data: {response.status_code}")
                 return False
             
-            points_data = response.json()
+            points_data = orjson.loads(response.content)
             if not validate_nws_response(points_data, 'points'):
                 logger.error("Invalid NWS points response")
                 return False
@@ -83,74 +96,83 @@ class NWSCoreFunctionalityTest:
             
             logger.info("✓ NWS points API working")
             
-            # Step 2: Get current conditions
-            current_data = None
-            try:
-                stations_response = requests.get(stations_url, headers=headers, timeout=30)
-                if stations_response.status_code == 200:
-                    stations_data = stations_response.json()
-                    stations = stations_data.get('features', [])
-                    
-                    if stations:
-                        station_id = stations[0].get('properties', {}).get('stationIdentifier')
-                        if station_id:
-                            current_url = f"{NWSConfig.BASE_URL}/stations/{station_id}/observations/latest"
-                            current_response = requests.get(current_url, headers=headers, timeout=30)
-                            if current_response.status_code == 200:
-                                current_data = current_response.json()
-                                logger.info("✓ NWS current conditions API working")
-            except Exception as e:
-                logger.warning(f"Current conditions test failed: {e}")
+            # Steps 2-4 only depend on the points metadata, so run them concurrently
+            def fetch_current():
+                """Step 2: Get current conditions"""
+                try:
+                    stations_response = self.session.get(stations_url, headers=headers, timeout=30)
+                    if stations_response.status_code == 200:
+                        stations_data = orjson.loads(stations_response.content)
+                        stations = stations_data.get('features', [])
+                        
+                        if stations:
+                            station_id = stations[0].get('properties', {}).get('stationIdentifier')
+                            if station_id:
+                                current_url = f"{NWSConfig.BASE_URL}/stations/{station_id}/observations/latest"
+                                current_response = self.session.get(current_url, headers=headers, timeout=30)
+                                if current_response.status_code == 200:
+                                    logger.info("✓ NWS current conditions API working")
+                                    return orjson.loads(current_response.content)
+                except Exception as e:
+                    logger.warning(f"Current conditions test failed: {e}")
+                return None
             
-            # Step 3: Get hourly forecast
-            hourly_data = None
-            try:
-                hourly_response = requests.get(forecast_hourly_url, headers=headers, timeout=30)
-                if hourly_response.status_code == 200:
-                    hourly_data = hourly_response.json()
-                    if validate_nws_response(hourly_data, 'hourly'):
-                        logger.info("✓ NWS hourly forecast API working")
-            except Exception as e:
-                logger.warning(f"Hourly forecast test failed: {e}")
+            def fetch_forecast(url, response_type):
+                """Steps 3 and 4: Get hourly and daily forecasts"""
+                try:
+                    forecast_response = self.session.get(url, headers=headers, timeout=30)
+                    if forecast_response.status_code == 200:
+                        # Structure is validated by the transform in step 5
+                        forecast_data = orjson.loads(forecast_response.content)
+                        logger.info(f"✓ NWS {response_type} forecast API working")
+                        return forecast_data
+                except Exception as e:
+                    logger.warning(f"{response_type.capitalize()} forecast test failed: {e}")
+                return None
             
-            # Step 4: Get daily forecast
-            daily_data = None
-            try:
-                daily_response = requests.get(forecast_url, headers=headers, timeout=30)
-                if daily_response.status_code == 200:
-                    daily_data = daily_response.json()
-                    if validate_nws_response(daily_data, 'daily'):
-                        logger.info("✓ NWS daily forecast API working")
-            except Exception as e:
-                logger.warning(f"Daily forecast test failed: {e}")
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                current_future = executor.submit(fetch_current)
+                hourly_future = executor.submit(fetch_forecast, forecast_hourly_url, 'hourly')
+                daily_future = executor.submit(fetch_forecast, forecast_url, 'daily')
+                current_data = current_future.result()
+                hourly_data = hourly_future.result()
+                daily_data = daily_future.result()
             
             # Step 5: Transform and store data
             records_stored = 0
             
-            with DatabaseManager(self.temp_db_path) as db:
-                # Transform and store current weather
-                if current_data:
-                    transformed_current = transform_nws_current_weather(current_data)
-                    if transformed_current:
-                        db.insert_current_weather(transformed_current)
-                        records_stored += 1
-                        logger.info("✓ Current weather transformed and stored")
-                
-                # Transform and store hourly forecast
-                if hourly_data:
-                    transformed_hourly = transform_nws_hourly_forecast(hourly_data)
-                    if transformed_hourly:
-                        db.insert_hourly_weather(transformed_hourly)
-                        records_stored += len(transformed_hourly)
-                        logger.info(f"✓ {len(transformed_hourly)} hourly records transformed and stored")
-                
-                # Transform and store daily forecast
-                if daily_data:
-                    transformed_daily = transform_nws_daily_forecast(daily_data)
-                    if transformed_daily:
-                        db.insert_daily_weather(transformed_daily)
-                        records_stored += len(transformed_daily)
-                        logger.info(f"✓ {len(transformed_daily)} daily records transformed and stored")
+            with DatabaseManager(self.temp_db_path, self.connection) as db:
+                # Store everything in one transaction, as the extractor does
+                db.begin()
+                try:
+                    # Transform and store current weather
+                    if current_data:
+                        transformed_current = transform_nws_current_weather(current_data)
+                        if transformed_current:
+                            db.insert_current_weather(transformed_current)
+                            records_stored += 1
+                            logger.info("✓ Current weather transformed and stored")
+                    
+                    # Transform and store hourly forecast
+                    if hourly_data:
+                        transformed_hourly = transform_nws_hourly_forecast(hourly_data)
+                        if transformed_hourly:
+                            db.insert_hourly_weather(transformed_hourly)
+                            records_stored += len(transformed_hourly)
+                            logger.info(f"✓ {len(transformed_hourly)} hourly records transformed and stored")
+                    
+                    # Transform and store daily forecast
+                    if daily_data:
+                        transformed_daily = transform_nws_daily_forecast(daily_data)
+                        if transformed_daily:
+                            db.insert_daily_weather(transformed_daily)
+                            records_stored += len(transformed_daily)
+                            logger.info(f"✓ {len(transformed_daily)} daily records transformed and stored")
+                    
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
             
             if records_stored > 0:
                 logger.info(f"✓ Real NWS API data extraction successful - {records_stored} total records")
@@ -168,46 +190,38 @@ class NWSCoreFunctionalityTest:
         logger.info("Testing data schema compliance...")
         
         try:
-            with DatabaseManager(self.temp_db_path) as db:
-                # Check current weather schema
-                current_schema = db.execute_query("PRAGMA table_info(current_weather)")
-                expected_current_columns = {
-                    'timestamp', 'temp', 'feels_like', 'humidity', 'pressure',
-                    'wind_speed', 'wind_deg', 'description', 'icon'
+            with DatabaseManager(self.temp_db_path, self.connection) as db:
+                expected_columns = {
+                    'current_weather': {
+                        'timestamp', 'temp', 'feels_like', 'humidity', 'pressure',
+                        'wind_speed', 'wind_deg', 'description', 'icon'
+                    },
+                    'hourly_weather': {
+                        'timestamp', 'temp', 'feels_like', 'humidity', 'pressure',
+                        'wind_speed', 'wind_deg', 'description', 'icon', 'pop'
+                    },
+                    'daily_weather': {
+                        'date', 'temp_min', 'temp_max', 'temp_day', 'temp_night',
+                        'humidity', 'pressure', 'wind_speed', 'wind_deg',
+                        'description', 'icon', 'pop'
+                    },
                 }
-                actual_current_columns = {row['name'] for row in current_schema}
                 
-                if not expected_current_columns.issubset(actual_current_columns):
-                    missing = expected_current_columns - actual_current_columns
-                    logger.error(f"Missing columns in current_weather: {missing}")
-                    return False
-                
-                # Check hourly weather schema
-                hourly_schema = db.execute_query("PRAGMA table_info(hourly_weather)")
-                expected_hourly_columns = {
-                    'timestamp', 'temp', 'feels_like', 'humidity', 'pressure',
-                    'wind_speed', 'wind_deg', 'description', 'icon', 'pop'
-                }
-                actual_hourly_columns = {row['name'] for row in hourly_schema}
-                
-                if not expected_hourly_columns.issubset(actual_hourly_columns):
-                    missing = expected_hourly_columns - actual_hourly_columns
-                    logger.error(f"Missing columns in hourly_weather: {missing}")
-                    return False
-                
-                # Check daily weather schema
-                daily_schema = db.execute_query("PRAGMA table_info(daily_weather)")
-                expected_daily_columns = {
-                    'date', 'temp_min', 'temp_max', 'temp_day', 'temp_night',
-                    'humidity', 'pressure', 'wind_speed', 'wind_deg',
-                    'description', 'icon', 'pop'
-                }
-                actual_daily_columns = {row['name'] for row in daily_schema}
+                # Fetch the columns of all three tables in one query
+                schema = db.execute_query("""
+                    SELECT table_name, column_name
+                    FROM information_schema.columns
+                    WHERE table_name IN ('current_weather', 'hourly_weather', 'daily_weather')
+                """)
+                actual_columns = {table: set() for table in expected_columns}
+                for row in schema:
+                    actual_columns[row['table_name']].add(row['column_name'])
                 
-                if not expected_daily_columns.issubset(actual_daily_columns):
-                    missing = expected_daily_columns - actual_daily_columns
-                    logger.error(f"Missing columns in daily_weather: {missing}")
-                    return False
+                for table, expected in expected_columns.items():
+                    if not expected.issubset(actual_columns[table]):
+                        missing = expected - actual_columns[table]
+                        logger.error(f"Missing columns in {table}: {missing}")
+                        return False
                 
                 logger.info("✓ Data schema compliance test passed")
                 return True
@@ -221,79 +235,79 @@ class NWSCoreFunctionalityTest:
         logger.info("Testing data quality validation...")
         
         try:
-            with DatabaseManager(self.temp_db_path) as db:
-                # Test current weather data quality
-                current_data = db.execute_query("""
-                    SELECT 
-                        COUNT(*) as total,
-                        AVG(temp) as avg_temp,
-                        AVG(humidity) as avg_humidity,
-                        AVG(pressure) as avg_pressure,
-                        COUNT(CASE WHEN temp IS NOT NULL THEN 1 END) as temp_count,
-                        COUNT(CASE WHEN description IS NOT NULL AND description != '' THEN 1 END) as desc_count
-                    FROM current_weather
-                """)
+            with DatabaseManager(self.temp_db_path, self.connection) as db:
+                # Aggregate all three tables in one query; each CTE is a
+                # single row, so the cross join is one row of metrics
+                metrics = db.execute_query("""
+                    WITH current_stats AS (
+                        SELECT 
+                            COUNT(*) as current_total,
+                            AVG(temp) as current_avg_temp,
+                            AVG(humidity) as current_avg_humidity,
+                            AVG(pressure) as current_avg_pressure,
+                            COUNT(CASE WHEN temp IS NOT NULL THEN 1 END) as current_temp_count,
+                            COUNT(CASE WHEN description IS NOT NULL AND description != '' THEN 1 END) as current_desc_count
+                        FROM current_weather
+                    ),
+                    hourly_stats AS (
+                        SELECT 
+                            COUNT(*) as hourly_total,
+                            COUNT(DISTINCT DATE(timestamp)) as hourly_unique_days,
+                            AVG(pop) as hourly_avg_pop
+                        FROM hourly_weather
+                    ),
+                    daily_stats AS (
+                        SELECT 
+                            COUNT(*) as daily_total,
+                            COUNT(CASE WHEN temp_max >= temp_min THEN 1 END) as daily_logical_temp_count
+                        FROM daily_weather
+                        WHERE temp_max IS NOT NULL AND temp_min IS NOT NULL
+                    )
+                    SELECT * FROM current_stats, hourly_stats, daily_stats
+                """)[0]
                 
-                if current_data and current_data[0]['total'] > 0:
-                    data = current_data[0]
-                    
+                # Test current weather data quality
+                if metrics['current_total'] > 0:
                     # Check data completeness
-                    if data['temp_count'] == 0:
+                    if metrics['current_temp_count'] == 0:
                         logger.error("No temperature data found")
                         return False
                     
-                    if data['desc_count'] == 0:
+                    if metrics['current_desc_count'] == 0:
                         logger.error("No weather descriptions found")
                         return False
                     
                     # Check reasonable values for Boston
-                    if data['avg_temp'] is not None and not (-40 <= data['avg_temp'] <= 45):
-                        logger.warning(f"Temperature seems extreme: {data['avg_temp']}°C")
+                    avg_temp = metrics['current_avg_temp']
+                    if avg_temp is not None and not (-40 <= avg_temp <= 45):
+                        logger.warning(f"Temperature seems extreme: {avg_temp}°C")
                     
-                    if data['avg_humidity'] is not None and not (0 <= data['avg_humidity'] <= 100):
-                        logger.error(f"Invalid humidity: {data['avg_humidity']}%")
+                    avg_humidity = metrics['current_avg_humidity']
+                    if avg_humidity is not None and not (0 <= avg_humidity <= 100):
+                        logger.error(f"Invalid humidity: {avg_humidity}%")
                         return False
                     
                     logger.info("✓ Current weather data quality is good")
                 
                 # Test hourly weather data
-                hourly_data = db.execute_query("""
-                    SELECT 
-                        COUNT(*) as total,
-                        COUNT(DISTINCT DATE(timestamp)) as unique_days,
-                        AVG(pop) as avg_pop
-                    FROM hourly_weather
-                """)
-                
-                if hourly_data and hourly_data[0]['total'] > 0:
-                    data = hourly_data[0]
-                    
-                    if data['total'] < 12:  # Should have at least 12 hours
-                        logger.warning(f"Limited hourly data: {data['total']} records")
+                if metrics['hourly_total'] > 0:
+                    if metrics['hourly_total'] < 12:  # Should have at least 12 hours
+                        logger.warning(f"Limited hourly data: {metrics['hourly_total']} records")
                     
-                    if data['avg_pop'] is not None and not (0 <= data['avg_pop'] <= 1):
-                        logger.error(f"Invalid precipitation probability: {data['avg_pop']}")
+                    avg_pop = metrics['hourly_avg_pop']
+                    if avg_pop is not None and not (0 <= avg_pop <= 1):
+                        logger.error(f"Invalid precipitation probability: {avg_pop}")
                         return False
                     
-                    logger.info(f"✓ Hourly weather data quality is good ({data['total']} records)")
+                    logger.info(f"✓ Hourly weather data quality is good ({metrics['hourly_total']} records)")
                 
                 # Test daily weather data
-                daily_data = db.execute_query("""
-                    SELECT 
-                        COUNT(*) as total,
-                        COUNT(CASE WHEN temp_max >= temp_min THEN 1 END) as logical_temp_count
-                    FROM daily_weather
-                    WHERE temp_max IS NOT NULL AND temp_min IS NOT NULL
-                """)
-                
-                if daily_data and daily_data[0]['total'] > 0:
-                    data = daily_data[0]
-                    
-                    if data['logical_temp_count'] != data['total']:
+                if metrics['daily_total'] > 0:
+                    if metrics['daily_logical_temp_count'] != metrics['daily_total']:
                         logger.error("Some daily records have max temp < min temp")
                         return False
                     
-                    logger.info(f"✓ Daily weather data quality is good ({data['total']} records)")
+                    logger.info(f"✓ Daily weather data quality is good ({metrics['daily_total']} records)")
                 
                 logger.info("✓ Data quality validation passed")
                 return True
@@ -6,10 +6,12 @@ This script performs focused testing of the complete data extraction workflow
 and validates that the NWS integration works correctly.
 """
 
+import dataclasses
 import os
 import sys
 import time
 import tempfile
+from unittest.mock import patch
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 import logging
@@ -40,7 +42,6 @@ class SimpleEndToEndTest:
     
     def __init__(self):
         self.temp_db_path = None
-        self.original_db_path = config.duckdb_path
         
     def setup_test_database(self):
         """Set up temporary test database."""
@@ -207,11 +208,10 @@ class SimpleEndToEndTest:
             # Import here to avoid circular imports
             from extractor.main import WeatherExtractor
             
-            # Create extractor with test database
-            original_path = config.duckdb_path
-            config.duckdb_path = self.temp_db_path
-            
-            try:
+            # Create extractor with test database; the config is frozen, so
+            # patch in a modified copy
+            with patch('extractor.main.config',
+                       dataclasses.replace(config, duckdb_path=self.temp_db_path)):
                 extractor = WeatherExtractor()
                 
                 # Run extraction
@@ -234,9 +234,6 @@ class SimpleEndToEndTest:
                     else:
                         logger.error("✗ Complete workflow test failed - no data extracted")
                         return False
-                        
-            finally:
-                config.duckdb_path = original_path
                 
         except Exception as e:
             logger.error(f"✗ Complete workflow test failed: {e}")
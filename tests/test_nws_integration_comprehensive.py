@@ -22,7 +22,7 @@ from config import (
 from nws_client import NWSAPIClient, handle_nws_error, retry_with_exponential_backoff
 from nws_cache import NWSCache
 from utils import (
-    validate_nws_response, transform_nws_current_weather,
+    DatabaseManager, validate_nws_response, transform_nws_current_weather,
     transform_nws_hourly_forecast, transform_nws_daily_forecast,
     _convert_temperature, _convert_pressure, _convert_wind_speed,
     _map_nws_icon_to_weather_icon
@@ -538,6 +538,66 @@ class TestNWSCache:
         assert stats["valid_entries"] == 2
 
 
+class TestDatabaseManager:
+    """Test suite for DatabaseManager bulk loading."""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        with DatabaseManager(str(tmp_path / "weather.db")) as db:
+            db.initialize_database()
+            yield db
+    
+    @staticmethod
+    def write_json(path, rows):
+        path.write_text(json.dumps(rows))
+        return str(path)
+    
+    def test_bulk_load_hourly_replaces_existing_hours(self, db, tmp_path):
+        """Test that reloading hourly rows replaces them instead of duplicating."""
+        rows = [
+            {"timestamp": f"2024-01-15 {hour:02d}:00:00", "temp": 40.0 + hour, "feels_like": 38.0,
+             "humidity": 60, "pressure": None, "wind_speed": 10.0, "wind_deg": 315,
+             "description": "Clear", "icon": "01d", "pop": 0.1}
+            for hour in range(3)
+        ]
+        path = self.write_json(tmp_path / "hourly.json", rows)
+        
+        assert db.bulk_load_from_json(path, 'hourly_weather') == 3
+        assert db.bulk_load_from_json(path, 'hourly_weather') == 3
+        assert db.execute_query("SELECT COUNT(*) AS count FROM hourly_weather")[0]['count'] == 3
+        
+        # A newer forecast for an hour replaces the stored one
+        rows[0]["temp"] = 50.0
+        path = self.write_json(tmp_path / "hourly_update.json", rows[:1])
+        assert db.bulk_load_from_json(path, 'hourly_weather') == 1
+        result = db.execute_query("SELECT temp FROM hourly_weather ORDER BY timestamp")
+        assert [row['temp'] for row in result] == [50.0, 41.0, 42.0]
+    
+    def test_bulk_load_daily_and_current(self, db, tmp_path):
+        """Test that daily rows are keyed on date and current rows are appended."""
+        daily = [{"date": "2024-01-15", "temp_min": 30.0, "temp_max": 45.0, "temp_day": 45.0,
+                  "temp_night": 30.0, "humidity": 60, "pressure": None, "wind_speed": 8.0,
+                  "wind_deg": 270, "description": "Sunny", "icon": "01d", "pop": 0.0}]
+        path = self.write_json(tmp_path / "daily.json", daily)
+        db.bulk_load_from_json(path, 'daily_weather')
+        db.bulk_load_from_json(path, 'daily_weather')
+        assert db.execute_query("SELECT COUNT(*) AS count FROM daily_weather")[0]['count'] == 1
+        
+        current = [{"timestamp": "2024-01-15 10:00:00", "temp": 41.0, "feels_like": 38.0,
+                    "humidity": 65, "pressure": 1013, "wind_speed": 10.0, "wind_deg": 315,
+                    "description": "Clear", "icon": "01d"}]
+        path = self.write_json(tmp_path / "current.json", current)
+        db.bulk_load_from_json(path, 'current_weather')
+        db.bulk_load_from_json(path, 'current_weather')
+        assert db.execute_query("SELECT COUNT(*) AS count FROM current_weather")[0]['count'] == 2
+    
+    def test_bulk_load_unknown_table(self, db, tmp_path):
+        """Test that only the weather tables can be loaded."""
+        path = self.write_json(tmp_path / "rows.json", [])
+        with pytest.raises(ValueError):
+            db.bulk_load_from_json(path, 'users')
+
+
 class TestNWSIntegration:
     """Test suite for complete NWS API workflow integration."""
     
@@ -582,7 +642,7 @@ class TestNWSIntegration:
         # Mock successful response
         mock_response = Mock()
         mock_response.ok = True
-        mock_response.json.return_value = {"test": "data"}
+        mock_response.content = b'{"test": "data"}'
         mock_get.return_value = mock_response
         
         client = NWSAPIClient()
@@ -115,9 +115,7 @@ class ValidationReport:
                     # Fallback - assume all passed if exit code is 0
                     test_results = {
                         'manual_sql_compatibility': True,
-                        'dbt_compile': True,
-                        'dbt_run': True,
-                        'dbt_tests': True,
+                        'dbt_build': True,
                         'staging_outputs': True
                     }
                 
@@ -126,9 +124,7 @@ class ValidationReport:
                 logger.error(f"dbt compatibility tests failed: {result.stderr}")
                 return {
                     'manual_sql_compatibility': False,
-                    'dbt_compile': False,
-                    'dbt_run': False,
-                    'dbt_tests': False,
+                    'dbt_build': False,
                     'staging_outputs': False
                 }
                 
@@ -136,9 +132,7 @@ class ValidationReport:
             logger.error(f"Failed to run dbt compatibility tests: {e}")
             return {
                 'manual_sql_compatibility': False,
-                'dbt_compile': False,
-                'dbt_run': False,
-                'dbt_tests': False,
+                'dbt_build': False,
                 'staging_outputs': False
             }
     
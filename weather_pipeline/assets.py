@@ -29,17 +29,21 @@ def raw_weather_data(context: AssetExecutionContext) -> Dict[str, Any]:
         
         # Create extractor and run data extraction once
         extractor = WeatherExtractor()
-        extractor.extract_and_store_weather_data()
-        
-        # Get metadata from all tables
-        with extractor.db_manager(extractor.db_path) as db:
-            # Get latest current weather
-            latest_weather = db.get_latest_current_weather()
+        try:
+            extractor.extract_and_store_weather_data()
             
-            # Get record counts
-            current_count = db.connection.execute("SELECT COUNT(*) FROM current_weather").fetchone()[0]
-            hourly_count = db.connection.execute("SELECT COUNT(*) FROM hourly_weather WHERE timestamp::date = current_date").fetchone()[0]
-            daily_count = db.connection.execute("SELECT COUNT(*) FROM daily_weather WHERE date >= current_date").fetchone()[0]
+            # Get metadata from all tables
+            with extractor.db_manager(extractor.db_path) as db:
+                # Get latest current weather
+                latest_weather = db.get_latest_current_weather()
+                
+                # Get record counts
+                current_count = db.connection.execute("SELECT COUNT(*) FROM current_weather").fetchone()[0]
+                hourly_count = db.connection.execute("SELECT COUNT(*) FROM hourly_weather WHERE timestamp::date = current_date").fetchone()[0]
+                daily_count = db.connection.execute("SELECT COUNT(*) FROM daily_weather WHERE date >= current_date").fetchone()[0]
+        finally:
+            # Release the database file so the downstream dbt subprocesses can open it
+            extractor.close()
         
         metadata = {
             "current_records": MetadataValue.int(current_count),